@@ -0,0 +1,292 @@
+"""Times the scan, selection and generation phases on a synthetic tree.
+
+    python benchmarks/run.py --preset 100k
+    xvfb-run python benchmarks/run.py --preset 10k --tk
+
+Each phase reports its best wall time over --repeat rounds, its throughput and the peak
+RSS of the process after it ran.
+Results are compared against benchmarks/baseline.json; phases slower than the baseline by
+more than --tolerance are reported and make the run exit with status 1.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import platform
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import DEFAULT_SETTINGS, StructureEngine
+from selection import SelectionModel
+from search_index import SearchIndex
+from preview import OutputBuffer
+from synthetic import default_shape, generate_tree
+
+PRESETS = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, None where the platform can't tell"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class Results:
+    def __init__(self):
+        self.phases = {}
+
+    def timed(self, name, func, unit="items"):
+        """Runs func, which returns the number of units it handled, and records the phase"""
+        start = time.perf_counter()
+        count = func()
+        seconds = time.perf_counter() - start
+        if name in self.phases and self.phases[name]['seconds'] <= seconds:
+            return count
+        self.phases[name] = {
+            'seconds': seconds,
+            unit: count,
+            'per_second': count / seconds if seconds else None,
+            'unit': unit,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+        return count
+
+
+def engine_settings(include_contents, cache_mb=0, scan_index=False):
+    settings = json.loads(json.dumps(DEFAULT_SETTINGS))
+    settings['scan_index'] = scan_index
+    settings['content_cache'] = {'memory_mb': cache_mb, 'persist': False}
+    settings['file_content_settings']['include_contents'] = include_contents
+    return settings
+
+
+def run_headless(root, data_dir, results, toggles):
+    # Scan: a plain walk, then with the scan index cold and warm
+    engine = StructureEngine(engine_settings(False), data_dir)
+    model = None
+    def scan():
+        nonlocal model
+        model = engine.scan(root)
+        return sum(len(dirs) + len(files) for dirs, files in model.listings.values())
+    results.timed("scan", scan)
+    parallel = StructureEngine(dict(engine_settings(False), scan_workers=8), data_dir)
+    results.timed("scan_parallel", lambda: len(parallel.scan(root).listings), "folders")
+    indexed = StructureEngine(engine_settings(False, scan_index=True), data_dir)
+    results.timed("scan_index_cold", lambda: len(indexed.scan(root).listings), "folders")
+    results.timed("scan_index_warm", lambda: len(indexed.scan(root).listings), "folders")
+
+    # Selection: counters built the way the GUI applies listings, then clicks and collection
+    folders = sorted(model.listings)  # Parents sort before their subfolders
+    selection = None
+    def build_selection():
+        nonlocal selection
+        selection = SelectionModel(model)
+        for path in folders:
+            selection.update_listing(path, None)
+        return len(folders)
+    results.timed("select_build", build_selection, "folders")
+    rng = random.Random(1)
+    def toggle():
+        selection.set(root, True)
+        for _ in range(toggles):
+            path = rng.choice(folders)
+            selection.set(path, not selection.state(path))
+        return toggles + 1
+    results.timed("select_toggle", toggle, "toggles")
+    selection.set(root, True)
+    checked = []
+    def collect():
+        checked[:] = selection.checked_paths()
+        return len(checked)
+    results.timed("select_collect", collect)
+
+    # Search: the index built the way the GUI applies listings, then a user typing a name
+    index = None
+    def build_index():
+        nonlocal index
+        index = SearchIndex(root)
+        for path in folders:
+            dirs, files = model.listings[path]
+            index.update_listing(path, dirs, files)
+        return len(index)
+    results.timed("search_build", build_index)
+    queries = ["f", "f1", "f12", "f12.", ".py", "d2_", "d2_1"]
+    def search():
+        index.last_query = None
+        for query in queries:
+            index.search(query)
+        return len(queries)
+    results.timed("search_query", search, "queries")
+
+    # Generation with file contents, without and with the content cache
+    written = [0]
+    def sink(text):
+        written[0] += len(text)
+    for name, cache_mb in (("generate", 0), ("generate_cached_cold", 512), ("generate_cached_warm", None)):
+        if cache_mb is not None:
+            generator = StructureEngine(engine_settings(True, cache_mb), data_dir)
+        written[0] = 0
+        def generate():
+            generator.generate(root, checked, sink)
+            return written[0] / (1024 * 1024)
+        results.timed(name, generate, "mb")
+
+    # A 100k token budget: files that don't fit are never opened
+    budgeted = StructureEngine(engine_settings(True), data_dir)
+    budgeted.settings['file_content_settings']['budget'] = 100_000
+    def generate_budget():
+        written[0] = 0
+        budgeted.generate(root, checked, sink)
+        return written[0] / (1024 * 1024)
+    results.timed("generate_budget", generate_budget, "mb")
+
+    # The GUI's output path: generation into the line-indexed buffer, then scrolling the preview
+    buffer = None
+    def generate_buffered():
+        nonlocal buffer
+        if buffer is not None:
+            buffer.close()
+        buffer = OutputBuffer()
+        generator.generate(root, checked, buffer.write, on_file=buffer.mark_file)
+        return buffer.size / (1024 * 1024)
+    results.timed("generate_buffered", generate_buffered, "mb")
+    def scroll():
+        lines = buffer.line_count()
+        for _ in range(1000):
+            buffer.read_lines(rng.randrange(lines), 50)
+        return 1000
+    results.timed("preview_scroll", scroll, "windows")
+    buffer.close()
+
+
+def run_tk(root, data_dir, results):
+    """The same phases through DirectoryStructureApp, Treeview inserts and repaints included"""
+    try:
+        import tkinter as tk
+        from gui import DirectoryStructureApp
+        window = tk.Tk()
+    except Exception as e:  # No display, or Tk isn't installed
+        print(f"Skipping Tk phases: {e}")
+        return
+    settings_file = os.path.join(data_dir, "settings.json")
+    with open(settings_file, "w", encoding="utf-8") as f:
+        json.dump(engine_settings(True, cache_mb=0), f)
+    app = DirectoryStructureApp(window, settings_file)
+
+    def wait_for(condition):
+        while not condition():
+            window.update()
+            time.sleep(0.001)
+
+    def scan():
+        app.open_directory(root)
+        wait_for(lambda: app.scan_done)
+        return app.processed_items
+    results.timed("tk_scan", scan)
+
+    def toggle():
+        app.selection.set(root, True)
+        app.refresh_check_marks(app.treeview.get_children())
+        window.update()
+        return 1
+    results.timed("tk_toggle", toggle, "toggles")
+    results.timed("tk_collect", lambda: len(app.get_checked_items()))
+
+    def generate():
+        app.generate_structure()
+        wait_for(lambda: app.cancel_event is None)
+        return app.output_file.size / (1024 * 1024)
+    results.timed("tk_generate", generate, "mb")
+    window.destroy()
+
+
+def compare(results, baseline, tolerance):
+    """Prints every phase next to its baseline and returns the names of the regressed ones"""
+    regressions = []
+    print(f"{'phase':<24}{'seconds':>10}{'rate':>22}{'peak MB':>10}{'baseline':>10}{'change':>9}")
+    for name, phase in results.items():
+        rate = f"{phase['per_second']:,.0f} {phase['unit']}/s" if phase['per_second'] else "-"
+        rss = f"{phase['peak_rss_mb']:.0f}" if phase['peak_rss_mb'] is not None else "-"
+        line = f"{name:<24}{phase['seconds']:>10.3f}{rate:>22}{rss:>10}"
+        reference = baseline.get(name)
+        if reference:
+            change = phase['seconds'] / reference['seconds'] - 1
+            line += f"{reference['seconds']:>10.3f}{change:>+9.0%}"
+            if change > tolerance:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scanning, selection and generation.")
+    parser.add_argument("--preset", choices=PRESETS, default="10k", help="Number of files in the synthetic tree")
+    parser.add_argument("--files", type=int, help="Overrides the preset file count")
+    parser.add_argument("--depth", type=int)
+    parser.add_argument("--fanout", type=int)
+    parser.add_argument("--median-size", type=int)
+    parser.add_argument("--binary-ratio", type=float)
+    parser.add_argument("--trees", default=os.path.join(tempfile.gettempdir(), "structure-benchmarks"),
+                        help="Folder where the synthetic trees are kept between runs")
+    parser.add_argument("--repeat", type=int, default=3, help="Rounds to run, the fastest time of each phase is kept")
+    parser.add_argument("--toggles", type=int, default=1000, help="Random folder clicks in select_toggle")
+    parser.add_argument("--tk", action="store_true", help="Also time the GUI phases (needs a display or Xvfb)")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before a phase regresses")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    shape = default_shape(args.files or PRESETS[args.preset])
+    for key in ('depth', 'fanout', 'median_size', 'binary_ratio'):
+        if getattr(args, key) is not None:
+            shape[key] = getattr(args, key)
+    key = "files={files} depth={depth} fanout={fanout} median={median_size} binary={binary_ratio}".format(**shape)
+    root = os.path.join(args.trees, key.replace(" ", "_").replace("=", "-"))
+    start = time.perf_counter()
+    if generate_tree(root, shape):
+        print(f"Generated {root} in {time.perf_counter() - start:.1f}s")
+
+    # Every round starts from empty caches; the fastest round of each phase is kept
+    results = Results()
+    for _ in range(args.repeat):
+        with tempfile.TemporaryDirectory() as data_dir:
+            run_headless(root, data_dir, results, args.toggles)
+            if args.tk:
+                run_tk(root, data_dir, results)
+
+    try:
+        with open(args.baseline, encoding="utf-8") as f:
+            baselines = json.load(f)
+    except (OSError, ValueError):
+        baselines = {}
+    print(f"{key} on {platform.python_implementation()} {platform.python_version()}, {platform.machine()}")
+    regressions = compare(results.phases, baselines.get(key, {}), args.tolerance)
+
+    report = {'shape': shape, 'python': platform.python_version(), 'phases': results.phases}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        baselines[key] = results.phases
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+    elif regressions:
+        print(f"Slower than the baseline: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
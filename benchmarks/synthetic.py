@@ -0,0 +1,112 @@
+"""Generates reproducible synthetic project trees for the benchmarks.
+
+The same shape and seed always give the same tree, so timings can be compared between runs
+and machines. A tree that already matches the requested shape is reused.
+"""
+import os
+import json
+import math
+import random
+import shutil
+import argparse
+
+MANIFEST = ".synthetic.json"
+TEXT_EXTENSIONS = [".py", ".js", ".ts", ".md", ".json", ".txt", ".css", ".html"]
+BINARY_EXTENSIONS = [".png", ".bin", ".zip"]
+WORDS = ("def return import class self value items path folder index cache tree node "
+         "build scan select generate const let function for while if else").split()
+
+
+def default_shape(files):
+    return {
+        'files': files,
+        'depth': 4,
+        'fanout': max(2, round(files ** 0.25 / 1.5)),
+        'median_size': 2048,  # Bytes, sizes follow a log-normal distribution
+        'max_size': 256 * 1024,
+        'binary_ratio': 0.1,
+        'seed': 1,
+    }
+
+
+def folder_paths(root, depth, fanout):
+    """Returns every folder of a complete tree, the root included, in creation order"""
+    folders = [root]
+    level = [root]
+    for d in range(depth):
+        level = [os.path.join(parent, f"d{d}_{i}") for parent in level for i in range(fanout)]
+        folders.extend(level)
+    return folders
+
+
+def text_block(rng, size):
+    lines = []
+    total = 0
+    while total < size:
+        line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12))) + "\n"
+        lines.append(line)
+        total += len(line)
+    return "".join(lines)[:size]
+
+
+def generate_tree(root, shape):
+    """Creates the tree described by shape under root, or reuses it if it is already there"""
+    manifest = os.path.join(root, MANIFEST)
+    try:
+        with open(manifest, encoding="utf-8") as f:
+            if json.load(f) == shape:
+                return False
+    except (OSError, ValueError):
+        pass
+    shutil.rmtree(root, ignore_errors=True)
+
+    rng = random.Random(shape['seed'])
+    folders = folder_paths(root, shape['depth'], shape['fanout'])
+    for folder in folders:
+        os.makedirs(folder, exist_ok=True)
+
+    # Contents are cut from one pregenerated block, so a million files stay cheap to write
+    corpus = text_block(rng, shape['max_size'] * 2)
+    sigma = 1.0
+    for i in range(shape['files']):
+        folder = folders[rng.randrange(len(folders))]
+        size = min(shape['max_size'], int(rng.lognormvariate(math.log(shape['median_size']), sigma)))
+        if rng.random() < shape['binary_ratio']:
+            # Half of the binary files hide behind a text extension, as build outputs often do
+            extension = rng.choice(BINARY_EXTENSIONS if rng.random() < 0.5 else TEXT_EXTENSIONS)
+            start = rng.randrange(len(corpus) - size) if size < len(corpus) else 0
+            data = b"\0" + corpus[start:start + size].encode("ascii")[1:]
+            with open(os.path.join(folder, f"f{i}{extension}"), "wb") as f:
+                f.write(data)
+        else:
+            extension = rng.choice(TEXT_EXTENSIONS)
+            start = rng.randrange(len(corpus) - size) if size < len(corpus) else 0
+            with open(os.path.join(folder, f"f{i}{extension}"), "w", encoding="ascii", newline="") as f:
+                f.write(corpus[start:start + size])
+
+    with open(manifest, "w", encoding="utf-8") as f:
+        json.dump(shape, f)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create a synthetic project tree for benchmarking.")
+    parser.add_argument("root")
+    parser.add_argument("--files", type=int, default=10_000)
+    parser.add_argument("--depth", type=int)
+    parser.add_argument("--fanout", type=int)
+    parser.add_argument("--median-size", type=int)
+    parser.add_argument("--binary-ratio", type=float)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    shape = default_shape(args.files)
+    for key in ('depth', 'fanout', 'median_size', 'binary_ratio', 'seed'):
+        if getattr(args, key) is not None:
+            shape[key] = getattr(args, key)
+    created = generate_tree(args.root, shape)
+    print(("Created" if created else "Reused") + f" {args.root}: {shape}")
+
+
+if __name__ == "__main__":
+    main()
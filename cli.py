@@ -0,0 +1,152 @@
+"""Command line entry point: python -m cli ROOT [options]
+
+Generates the same text as the GUI without importing tkinter, so it can run on
+build agents and in CI without a display.
+"""
+import os
+import sys
+import argparse
+from fnmatch import fnmatch
+
+from engine import StructureEngine, data_dir_for, load_settings
+from export import format_for, open_output
+from profiler import Profiler
+from snapshot import Snapshot
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Generate a directory structure as text.")
+    parser.add_argument("root", help="directory to describe")
+    parser.add_argument("--settings", default="directory_settings.json",
+                        help="settings file (default: %(default)s)")
+    parser.add_argument("--include", action="append", default=[], metavar="PATTERN",
+                        help="relative path or glob to select, along with everything below it (repeatable; default: everything)")
+    parser.add_argument("--exclude", action="append", default=[], metavar="PATTERN",
+                        help="relative path or glob to leave out, along with everything below it (repeatable)")
+    contents = parser.add_mutually_exclusive_group()
+    contents.add_argument("--contents", dest="include_contents", action="store_true", default=None,
+                          help="include file contents, overriding the settings file")
+    contents.add_argument("--no-contents", dest="include_contents", action="store_false",
+                          help="leave out file contents, overriding the settings file")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="write identical file contents once, later copies refer to the first path")
+    parser.add_argument("--budget", type=int, metavar="N",
+                        help="limit the output to about N tokens (or bytes with --budget-unit bytes); files that don't fit are listed but not read")
+    parser.add_argument("--budget-unit", choices=["tokens", "bytes"], help="unit of --budget (default: tokens)")
+    parser.add_argument("--priority", choices=["size", "extension", "depth"],
+                        help="which files the budget goes to first: smallest, by allowed extension order, or shallowest")
+    parser.add_argument("--snapshot", metavar="FILE",
+                        help="save a manifest of the files in this output (size, mtime, content hash) for a later --since")
+    parser.add_argument("--since", metavar="FILE",
+                        help="only write the contents of files added or modified since this manifest, marking changes in the tree")
+    parser.add_argument("--no-index", action="store_true",
+                        help="list every folder instead of reusing the scan index next to the settings file")
+    parser.add_argument("--workers", type=int, metavar="N",
+                        help="list up to N folders in parallel, overriding the settings file (useful on network mounts)")
+    parser.add_argument("-o", "--output", help="write to this file instead of stdout; .gz names are compressed")
+    parser.add_argument("--format", choices=["text", "ndjson", "json"],
+                        help="output format (default: from the output file extension, else text)")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="write phase timings and counters as a Chrome trace, and a summary to stderr")
+    parser.add_argument("--cprofile", metavar="FILE", help="run under cProfile and save the stats to this file")
+    return parser.parse_args(argv)
+
+
+def matches(rel_path, patterns):
+    """True if rel_path or one of its parent folders matches any of the patterns"""
+    parts = rel_path.split("/")
+    for i in range(1, len(parts) + 1):
+        prefix = "/".join(parts[:i])
+        if any(fnmatch(prefix, pattern.strip("/")) for pattern in patterns):
+            return True
+    return False
+
+
+def select_paths(model, include, exclude):
+    """Returns the paths of the scan model picked by the include/exclude patterns, in tree order"""
+    selected = []
+    for path in model.walk(model.root):
+        rel_path = os.path.relpath(path, model.root).replace(os.sep, "/")
+        if include and not matches(rel_path, include):
+            continue
+        if exclude and matches(rel_path, exclude):
+            continue
+        selected.append(path)
+    return selected
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    root = os.path.abspath(args.root)
+    if not os.path.isdir(root):
+        print(f"Error: {args.root} is not a directory", file=sys.stderr)
+        return 2
+
+    settings = load_settings(args.settings)
+    if args.include_contents is not None:
+        settings['file_content_settings']['include_contents'] = args.include_contents
+    if args.dedupe:
+        settings['file_content_settings']['deduplicate'] = True
+    if args.budget is not None:
+        settings['file_content_settings']['budget'] = max(0, args.budget)
+    if args.budget_unit:
+        settings['file_content_settings']['budget_unit'] = args.budget_unit
+    if args.priority:
+        settings['file_content_settings']['budget_priority'] = args.priority
+    if args.no_index:
+        settings['scan_index'] = False
+    if args.workers is not None:
+        settings['scan_workers'] = max(1, args.workers)
+    engine = StructureEngine(settings, data_dir_for(args.settings))
+
+    export_format = args.format or (format_for(args.output)[0] if args.output else 'text')
+    since = record = None
+    if args.snapshot or args.since:
+        if export_format != 'text':
+            print("Error: --snapshot and --since only apply to text output", file=sys.stderr)
+            return 2
+        try:
+            since = Snapshot.load(args.since) if args.since else None
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        if args.since and since is None:
+            print(f"Error: {args.since} does not exist", file=sys.stderr)
+            return 2
+        if since is not None and os.path.abspath(since.root) != root:
+            print(f"Error: {args.since} is a snapshot of {since.root}", file=sys.stderr)
+            return 2
+        record = Snapshot(root) if args.snapshot else None
+
+    def write_output(write):
+        if since is not None or record is not None:
+            engine.generate(root, checked_paths, write, profiler=profiler, since=since, record=record)
+        else:
+            engine.export(model, checked_paths, write, export_format, profiler=profiler)
+
+    profiler = Profiler("cli", args.cprofile)
+    with profiler.capture():
+        with profiler.phase("scan"):
+            model = engine.scan(root, profiler)
+        with profiler.phase("select"):
+            checked_paths = select_paths(model, args.include, args.exclude)
+        if not checked_paths:
+            print("Error: no items were selected", file=sys.stderr)
+            return 1
+
+        if args.output:
+            with open_output(args.output, format_for(args.output)[1]) as file:
+                write_output(file.write)
+        else:
+            write_output(sys.stdout.write)
+        if record is not None:
+            record.save(args.snapshot)
+
+    if args.trace:
+        Profiler.export(args.trace, [profiler])
+        print(profiler.summary(), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from sqlite_store import RACY_WINDOW_NS, SQLiteStore
+
+
+class ContentCache:
+    """LRU cache of file contents and their digests keyed on (path, size, mtime_ns), optionally kept in SQLite.
+
+    Any write to a file changes its mtime or size, so one stat is enough to validate an
+    entry. Sizes are counted in characters, which is close enough to bytes for a budget.
+    Safe to use from the reader threads. If the database can't be used the cache stays in memory. Rows
+    of files that changed are dropped when they are looked up, and flush() drops the rows
+    written longest ago once the database holds more than max_disk_bytes.
+    """
+    ENTRY_OVERHEAD = 200
+
+    def __init__(self, max_bytes, cache_file=None, max_disk_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.entries = OrderedDict()  # path -> (size, mtime_ns, content, digest), least recently used first
+        self.used = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.store = None
+        if cache_file:
+            try:
+                self.store = SQLiteStore(cache_file, [
+                    "CREATE TABLE IF NOT EXISTS contents ("
+                    "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, content TEXT, digest BLOB)"])
+            except sqlite3.DatabaseError:
+                pass  # Locked for too long, or not a database
+            else:
+                columns = [row[1] for row in self.store.query("PRAGMA table_info(contents)")]
+                if "digest" not in columns:
+                    self.store.write("ALTER TABLE contents ADD COLUMN digest BLOB")
+                    self.store.commit()
+
+    def get(self, path, size, mtime_ns):
+        """Returns (True, content, digest) for a valid entry, where None content means a skipped binary file.
+
+        digest is None when the entry was stored without one.
+        """
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == size and entry[1] == mtime_ns:
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return True, entry[2], entry[3]
+            if self.store is not None:
+                rows = self.store.query("SELECT size, mtime_ns, content, digest FROM contents WHERE path = ?", (path,))
+                row = rows[0] if rows else None
+                if row is not None and row[0] == size and row[1] == mtime_ns:
+                    self.remember(path, *row)
+                    self.hits += 1
+                    return True, row[2], row[3]
+                if row is not None:
+                    self.store.write("DELETE FROM contents WHERE path = ?", (path,))  # The file changed
+            self.misses += 1
+            return False, None, None
+
+    def put(self, path, size, mtime_ns, content, digest=None):
+        if time.time_ns() - mtime_ns < RACY_WINDOW_NS:
+            return
+        with self.lock:
+            self.remember(path, size, mtime_ns, content, digest)
+            if self.store is not None:
+                self.store.write(
+                    "INSERT OR REPLACE INTO contents VALUES (?, ?, ?, ?, ?)", (path, size, mtime_ns, content, digest))
+
+    def remember(self, path, size, mtime_ns, content, digest):
+        old = self.entries.pop(path, None)
+        if old is not None:
+            self.used -= len(old[2] or "") + self.ENTRY_OVERHEAD
+        cost = len(content or "") + self.ENTRY_OVERHEAD
+        if cost > self.max_bytes:
+            return
+        self.entries[path] = (size, mtime_ns, content, digest)
+        self.used += cost
+        while self.used > self.max_bytes:
+            _, (_, _, evicted, _) = self.entries.popitem(last=False)
+            self.used -= len(evicted or "") + self.ENTRY_OVERHEAD
+
+    def flush(self):
+        with self.lock:
+            if self.store is not None:
+                self.prune()
+                self.store.commit()
+
+    def prune(self):
+        """Drops the oldest rows until the database is back under 90% of max_disk_bytes.
+
+        INSERT OR REPLACE gives a row a new rowid, so rowid order is the order rows were last
+        written in. Rows go a batch at a time, sized from the average row, until the pages in
+        use are under the target. Freed pages are reused by later rows, the file itself doesn't
+        shrink.
+        """
+        used = self.disk_usage()
+        if used is None or used <= self.max_disk_bytes:
+            return
+        target = self.max_disk_bytes * 9 // 10
+        while used is not None and used > target:
+            counts = self.store.query("SELECT count(*) FROM contents")
+            rows = counts[0][0] if counts else 0
+            if not rows:
+                return
+            batch = -(-(used - target) * rows // used)  # Rows of average size that make up the excess
+            self.store.write(
+                "DELETE FROM contents WHERE rowid IN (SELECT rowid FROM contents ORDER BY rowid LIMIT ?)", (batch,))
+            used = self.disk_usage()
+
+    def disk_usage(self):
+        """Bytes of the pages in use, None once the database is closed"""
+        rows = self.store.query("SELECT * FROM pragma_page_size, pragma_page_count, pragma_freelist_count")
+        if not rows:
+            return None
+        page_size, page_count, free_pages = rows[0]
+        return (page_count - free_pages) * page_size
@@ -0,0 +1,861 @@
+import os
+import io
+import json
+import stat
+import codecs
+import hashlib
+import sqlite3
+from collections import deque
+from itertools import chain, tee
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+from scan_index import ScanIndex
+from content_cache import ContentCache
+from ignore_rules import IGNORE_FILES, IgnoreLevel
+from export import write_json_tree, write_ndjson
+from nodes import ADDED, DELETED, MODIFIED, OMITTED, NodeTable
+
+DEFAULT_SETTINGS = {
+    'ignored_folders': ["node_modules", ".venv", ".mypy_cache", ".git"],
+    'use_ignore_files': True,
+    'scan_workers': 1,
+    'lazy_tree': True,
+    'scan_index': True,
+    'watch_mode': False,
+    'profile_next_run': False,
+    'content_cache': {
+        'memory_mb': 64,
+        'persist': False,
+        'disk_mb': 256,
+    },
+    'file_content_settings': {
+        'include_contents': False,
+        'max_file_size_kb': 100,
+        'deduplicate': False,
+        # Output limit for the generated text, 0 for none, in 'tokens' or 'bytes'; files are
+        # included whole in budget_priority order ('size', 'extension' or 'depth') while they fit
+        'budget': 0,
+        'budget_unit': 'tokens',
+        'budget_priority': 'size',
+        'allowed_extensions': [
+            # Text and configuration files
+            '.txt', '.md', '.json', '.yaml', '.yml', '.xml', '.csv', '.ini', '.env', '.log',
+            # Web development
+            '.html', '.htm', '.css', '.scss', '.sass', '.less', '.js', '.ts', '.jsx', '.tsx', '.vue', '.j2',
+            # Python and templates
+            '.py', '.ipynb', '.pyc', '.pyo', '.pyd',
+            # Java and related files
+            '.java', '.jar', '.class', '.jsp',
+            # C, C++ and related files
+            '.c', '.cpp', '.h', '.hpp', '.cc', '.cxx', '.ino',
+            # C# and .NET
+            '.cs', '.csproj', '.vb', '.resx',
+            # Ruby
+            '.rb', '.erb', '.gemspec', '.rake',
+            # PHP
+            '.php', '.phtml', '.php3', '.php4', '.php5', '.phps',
+            # Shell scripts and related files
+            '.sh', '.bash', '.zsh', '.bat', '.cmd', '.ps1',
+            # Go
+            '.go',
+            # Rust
+            '.rs',
+            # Swift
+            '.swift',
+            # Kotlin
+            '.kt', '.kts',
+            # Objective-C
+            '.m', '.mm',
+            # Dart and Flutter
+            '.dart',
+            # R
+            '.r', '.rmd',
+            # SQL and database files
+            '.sql', '.db', '.sqlite', '.sqlite3', '.db3',
+            # Other scripting languages
+            '.pl', '.pm', '.t', '.lua',
+            # Assembly and low-level
+            '.asm', '.s', '.a', '.o',
+            # Miscellaneous
+            '.makefile', '.mk', '.cmake', '.gradle', '.gyp', '.gypi',
+        ]
+    }
+}
+
+
+def estimate_tokens(text):
+    """Rough token count for LLM context limits, about four characters per token for code and English"""
+    return (len(text) + 3) // 4
+
+
+def load_settings(settings_file):
+    try:
+        with open(settings_file, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return json.loads(json.dumps(DEFAULT_SETTINGS))
+
+
+def save_settings(settings_file, settings):
+    with open(settings_file, 'w') as f:
+        json.dump(settings, f)
+
+
+def data_dir_for(settings_file):
+    """The scan index and content cache live next to the settings file"""
+    return os.path.dirname(os.path.abspath(settings_file))
+
+
+class ScanModel:
+    """Folder listings collected by a scan, used to create Treeview items on demand"""
+    def __init__(self, root):
+        self.root = root
+        self.listings = {}
+        self.unreadable = set()  # Folders that couldn't be listed (no permission, deleted meanwhile)
+
+    def add_directory(self, path, dirs, files):
+        self.listings[path] = (dirs, files)
+        self.unreadable.discard(path)
+
+    def remove_tree(self, path):
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            self.unreadable.discard(current)
+            dirs, _ = self.listings.pop(current, ((), ()))
+            stack.extend(os.path.join(current, name) for name in dirs)
+
+    def find_unreadable(self, folders=None):
+        """Records the subfolders of listed folders (all of them by default) that have no listing.
+
+        Only meaningful once the walk that should have listed them is over. Returns the ones
+        found this time.
+        """
+        found = []
+        for path in self.listings if folders is None else folders:
+            dirs, _ = self.listings.get(path, ((), ()))
+            for name in dirs:
+                child = os.path.join(path, name)
+                if child not in self.listings and child not in self.unreadable:
+                    self.unreadable.add(child)
+                    found.append(child)
+        return found
+
+    def is_dir(self, path):
+        return path in self.listings
+
+    def children(self, path):
+        """Returns (name, full path, is_dir) for each child of a folder, files first"""
+        dirs, files = self.listings.get(path, ((), ()))
+        children = [(name, os.path.join(path, name), False) for name in files]
+        children += [(name, os.path.join(path, name), True) for name in dirs]
+        return children
+
+    def walk(self, path):
+        """Yields the full path of every item below a folder, in the same order as the tree"""
+        stack = [iter(self.children(path))]
+        while stack:
+            for _, child_path, is_dir in stack[-1]:
+                yield child_path
+                if is_dir:
+                    stack.append(iter(self.children(child_path)))
+                    break
+            else:
+                stack.pop()
+
+
+class StructureEngine:
+    """Scanning, filtering and formatting shared by the GUI and the command line"""
+    # File reads during generation
+    READ_WORKERS = 8
+    MAX_INFLIGHT_BYTES = 32 * 1024 * 1024
+    # Leading bytes checked for NUL to tell binary files apart, then the read size for the rest
+    SNIFF_BYTES = 8 * 1024
+    READ_BLOCK = 64 * 1024
+    # Folder listings queued ahead of the walk per scan worker
+    PREFETCH_PER_WORKER = 8
+    # Appended in the tree to files whose contents didn't fit the output budget
+    OMITTED_MARK = " (omitted, over budget)"
+    # Appended in the tree to files that changed since the snapshot
+    CHANGE_MARKS = {ADDED: " (added)", MODIFIED: " (modified)", DELETED: " (deleted)"}
+
+    def __init__(self, settings, data_dir=None):
+        self.settings = settings
+        self._extensions_source = None
+        self._allowed_extensions = frozenset()
+        # Folder for the scan index and the persisted content cache, None to keep nothing on disk
+        self.data_dir = data_dir
+        self.index_file = os.path.join(data_dir, "scan_index.sqlite") if data_dir else None
+        self.counts_file = os.path.join(data_dir, "scan_counts.json") if data_dir else None
+        self._cache_settings = None
+        self._content_cache = None
+        self._patterns_source = None
+        self._ignore_rules = None
+
+    def ignore_rules(self):
+        """The IgnoreLevel of a scanned root from the ignored_folders patterns (gitignore syntax)"""
+        patterns = self.settings.get('ignored_folders', [])
+        if patterns is not self._patterns_source:
+            self._patterns_source = patterns
+            self._ignore_rules = IgnoreLevel.from_patterns(patterns)
+        return self._ignore_rules
+
+    def ignore_rules_for(self, root, path):
+        """Builds the IgnoreLevel of path, a folder inside root, as walk_directory reaches it"""
+        rules = self.ignore_rules()
+        use_files = self.settings.get('use_ignore_files', True)
+        current = root
+        for name in (os.path.relpath(path, root).split(os.sep) if path != root else []):
+            if use_files:
+                rules = rules.extend(current, IGNORE_FILES)
+            rules = rules.enter(name)
+            current = os.path.join(current, name)
+        return rules
+
+    def apply_rules(self, rules, path, dirs, files):
+        """Returns (rules for the entries of path, kept dir names, kept file names)"""
+        if self.settings.get('use_ignore_files', True):
+            rules = rules.extend(path, files)
+        dirs = [name for name in dirs if not rules.ignored(name, True)]
+        files = [name for name in files if not rules.ignored(name, False)]
+        return rules, dirs, files
+
+    @property
+    def allowed_extensions(self):
+        """The allowed extensions as a set, rebuilt only when the settings list is replaced"""
+        extensions = self.settings['file_content_settings']['allowed_extensions']
+        if extensions is not self._extensions_source:
+            self._extensions_source = extensions
+            self._allowed_extensions = frozenset(ext.lower() for ext in extensions)
+        return self._allowed_extensions
+
+    @property
+    def content_cache(self):
+        """The ContentCache for the current settings, or None when it is disabled"""
+        cache_settings = self.settings.get('content_cache', {})
+        key = (cache_settings.get('memory_mb', 64), cache_settings.get('persist', False), cache_settings.get('disk_mb', 256))
+        if key != self._cache_settings:
+            self._cache_settings = key
+            memory_mb, persist, disk_mb = key
+            cache_file = os.path.join(self.data_dir, "content_cache.sqlite") if persist and self.data_dir else None
+            self._content_cache = ContentCache(
+                memory_mb * 1024 * 1024, cache_file, disk_mb * 1024 * 1024) if memory_mb > 0 else None
+        return self._content_cache
+
+    def scan_directory(self, directory, profiler=None, priority=None):
+        """Walks the tree once, yielding (path, dir names, file names) top-down, sorted by name.
+
+        With a scan index, folders whose mtime hasn't changed since the last scan reuse their
+        stored listing instead of being listed again. Folder paths put in the priority queue
+        are scanned next, along with their subtree.
+        """
+        index = self.open_index(directory)
+        if index is not None:
+            with index:
+                yield from self.walk_directory(directory, index, profiler=profiler, priority=priority)
+                if profiler is not None:
+                    profiler.count(index_hits=index.hits)
+        else:
+            yield from self.walk_directory(directory, None, profiler=profiler, priority=priority)
+
+    def open_index(self, directory):
+        """The ScanIndex of directory, None when it is disabled or its database can't be used"""
+        if not self.index_file or not self.settings.get('scan_index', True):
+            return None
+        try:
+            return ScanIndex(self.index_file, directory)
+        except sqlite3.DatabaseError:
+            return None  # Locked by another writer for too long, or not a database
+
+    def walk_directory(self, directory, index, rules=None, profiler=None, priority=None):
+        """Yields the filtered listings below directory; ignored folders are never listed.
+
+        rules is the IgnoreLevel for directory before its own ignore files, by default the
+        one of a scanned root. Parents are always yielded before their subfolders.
+        """
+        workers = self.settings.get('scan_workers', 1)
+        if workers > 1:
+            yield from self.parallel_walk(directory, index, rules, profiler, workers, priority)
+            return
+        stack = [(directory, rules or self.ignore_rules())]
+        wanted = []
+        while stack:
+            if priority is not None:
+                self.prioritize(stack, wanted, priority)
+            current, rules = stack.pop()
+            listing = self.list_directory(current, index, profiler)
+            if listing is None:
+                continue
+            rules, dirs, files = self.apply_rules(rules, current, *listing)
+            yield current, dirs, files
+            stack.extend((os.path.join(current, name), rules.enter(name)) for name in reversed(dirs))
+
+    def parallel_walk(self, directory, index, rules, profiler, workers, priority=None):
+        """walk_directory with folders listed ahead on a pool of workers, in the same order.
+
+        Folders still to be yielded are listed speculatively, those next in tree order first,
+        with at most PREFETCH_PER_WORKER listings per worker queued or unconsumed. Idle workers
+        take the next queued listing, so a slow folder only holds up its own worker.
+        """
+        max_pending = workers * self.PREFETCH_PER_WORKER
+        stack = [[directory, rules or self.ignore_rules(), None]]
+        pending = 0
+        wanted = []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            try:
+                while stack:
+                    if priority is not None:
+                        self.prioritize(stack, wanted, priority)
+                    # Queue listings for the folders that come next, nearest first
+                    for entry in reversed(stack):
+                        if entry[2] is None:
+                            # The folder needed right now is always queued
+                            if pending >= max_pending and entry is not stack[-1]:
+                                break
+                            entry[2] = pool.submit(self.list_directory, entry[0], index, profiler)
+                            pending += 1
+                    current, rules, future = stack.pop()
+                    pending -= 1
+                    listing = future.result()
+                    if listing is None:
+                        continue
+                    rules, dirs, files = self.apply_rules(rules, current, *listing)
+                    yield current, dirs, files
+                    stack.extend([os.path.join(current, name), rules.enter(name), None] for name in reversed(dirs))
+            finally:
+                for _, _, future in stack:
+                    if future is not None:
+                        future.cancel()
+
+    @staticmethod
+    def prioritize(stack, wanted, priority):
+        """Moves the pending folder leading to the latest requested one to the top of a walk stack.
+
+        Requests are taken from the priority queue into wanted, and dropped once no pending
+        folder leads to them anymore (listed already, ignored or outside the walk).
+        """
+        while not priority.empty():
+            wanted.append(priority.get_nowait())
+        while wanted:
+            target = wanted[-1]
+            for i in range(len(stack) - 1, -1, -1):
+                path = stack[i][0]
+                if target == path or target.startswith(os.path.join(path, "")):
+                    stack.append(stack.pop(i))
+                    return
+            wanted.pop()
+
+    def list_directory(self, path, index=None, profiler=None):
+        """Returns the sorted (dir names, file names) of a folder, or None if it can't be read"""
+        if index is not None:
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                return None
+            listing = index.get(path, mtime_ns)
+            if listing is not None:
+                if profiler is not None:
+                    profiler.count(syscalls=1)
+                return listing
+
+        dirs, files = [], []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        # DirEntry type data comes from the listing itself, no extra stat
+                        if entry.is_dir():
+                            # Like os.walk, symlinked folders are never descended into
+                            if not entry.is_symlink():
+                                dirs.append(entry.name)
+                        else:
+                            files.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            return None
+        dirs.sort()
+        files.sort()
+        if profiler is not None:
+            # stat for the index, then open, getdents and close; large folders need more getdents
+            profiler.count(folders_listed=1, syscalls=3 if index is None else 4)
+
+        if index is not None:
+            index.put(path, mtime_ns, dirs, files)
+        return dirs, files
+
+    def scan(self, directory, profiler=None):
+        """Scans a whole tree into a ScanModel"""
+        model = ScanModel(directory)
+        for path, dirs, files in self.scan_directory(directory, profiler):
+            model.add_directory(path, dirs, files)
+            if profiler is not None:
+                profiler.count(items=len(dirs) + len(files))
+        model.find_unreadable()
+        return model
+
+    def remembered_count(self, directory):
+        """The item count of the last complete scan of directory, None if there was none"""
+        if not self.counts_file:
+            return None
+        try:
+            with open(self.counts_file, encoding="utf-8") as f:
+                return json.load(f).get(directory)
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def remember_count(self, directory, count):
+        """Keeps the item count of a complete scan for the progress of the next one"""
+        if not self.counts_file:
+            return
+        try:
+            with open(self.counts_file, encoding="utf-8") as f:
+                counts = json.load(f)
+        except (OSError, ValueError):
+            counts = {}
+        if not isinstance(counts, dict):
+            counts = {}
+        counts[directory] = count
+        try:
+            with open(self.counts_file, "w", encoding="utf-8") as f:
+                json.dump(counts, f)
+        except OSError:
+            pass  # Only the next progress estimate is worse
+
+    @staticmethod
+    def estimate_total(processed, scanned_dirs, pending_dirs, remembered):
+        """Estimates the total item count while a scan is still running"""
+        if remembered:
+            return max(remembered, processed)
+        # Assume every pending folder holds as many items as the average scanned one
+        return processed + pending_dirs * (processed / max(scanned_dirs, 1))
+
+    def generate(self, directory, checked_paths, write, cancel_event=None, on_progress=None, profiler=None, on_file=None,
+                 since=None, record=None):
+        """Streams the structure text for the checked paths to write(): the tree, then the file contents.
+
+        Nothing is accumulated, so the output can go straight to a file, stdout or the preview.
+        on_progress(done, total) is called after each file has been handled and on_file(rel_path)
+        right before the header of each file's contents is written. Returns False if
+        cancel_event was set before the output was complete. A Profiler records the "tree" and
+        "contents" phases and the file reads.
+
+        With a Snapshot as since, the tree marks the files added, modified and deleted since
+        then and only the added and modified contents are written. A Snapshot given as record
+        is filled with the files this output covers, to be saved for the next run.
+        """
+        # The cache outlives this run, its hits and misses are counted from here
+        cache = self.content_cache
+        if cache is not None:
+            hits, misses = cache.hits, cache.misses
+
+        with profiler.phase("tree") if profiler is not None else nullcontext():
+            tree = self.build_tree(directory, checked_paths)
+            leaves = list(self.iter_leaves(tree))
+        preloaded = {}
+        if since is not None:
+            with profiler.phase("changes") if profiler is not None else nullcontext():
+                preloaded = self.compare_snapshot(tree, leaves, since, record, cancel_event, profiler)
+            leaves = [(node, rel_path) for node, rel_path in leaves if tree.flags[node] & (ADDED | MODIFIED)]
+        if self.settings['file_content_settings'].get('budget'):
+            with profiler.phase("budget") if profiler is not None else nullcontext():
+                self.apply_budget(tree, leaves, cancel_event, profiler)
+            # Omitted files are listed in the tree but never opened
+            leaves = [(node, rel_path) for node, rel_path in leaves if not tree.flags[node] & OMITTED]
+        with profiler.phase("tree") if profiler is not None else nullcontext():
+            self.write_structure(tree, write)
+
+        # File contents are read concurrently but written in tree order
+        with profiler.phase("contents") if profiler is not None else nullcontext():
+            paths = (os.path.join(directory, rel_path) for _, rel_path in leaves)
+            first = True
+            deduplicate = self.settings['file_content_settings'].get('deduplicate', False)
+            first_paths = {}  # digest -> rel_path of the first file written with that content
+            def loader(path, profiler):
+                # Files hashed while comparing with the snapshot aren't read twice
+                entry = preloaded.pop(path, None)
+                return entry if entry is not None else self.load_entry(path, profiler, record is not None)
+            results = self.read_files(paths, cancel_event, profiler, loader)
+            for done, ((_, rel_path), (path, (content, digest, st))) in enumerate(zip(leaves, results), 1):
+                if record is not None:
+                    st = st or self.stat_file(path, profiler)
+                    if st is not None:
+                        record.add(rel_path, st, digest)
+                if not deduplicate:
+                    digest = None
+                if content is not None and content.strip():
+                    write("\n\n# File Contents\n\n" if first else "\n")
+                    if on_file:
+                        on_file(rel_path)
+                    if digest is not None and digest in first_paths:
+                        write(f"# {rel_path}\n(same content as {first_paths[digest]})\n")
+                        if profiler is not None:
+                            profiler.count(duplicates=1, duplicate_chars=len(content))
+                    else:
+                        write(f"# {rel_path}\n{content}\n")
+                        if digest is not None:
+                            first_paths[digest] = rel_path
+                    first = False
+                if on_progress:
+                    on_progress(done, len(leaves))
+
+        if cache is not None:
+            cache.flush()
+            if profiler is not None:
+                profiler.count(cache_hits=cache.hits - hits, cache_misses=cache.misses - misses)
+        return cancel_event is None or not cancel_event.is_set()
+
+    def export(self, model, checked_paths, write, export_format, cancel_event=None, on_progress=None, profiler=None):
+        """Streams the scan model in a structured format ('ndjson' or 'json', see export.py), or as
+        text like generate(). Returns False if cancel_event was set before the output was complete."""
+        if export_format == 'text':
+            return self.generate(model.root, checked_paths, write, cancel_event, on_progress, profiler)
+        records = self.iter_records(model, checked_paths, cancel_event, on_progress, profiler)
+        with profiler.phase("export") if profiler is not None else nullcontext():
+            if export_format == 'ndjson':
+                write_ndjson(records, write)
+            else:
+                write_json_tree(records, write, os.path.basename(model.root))
+        return cancel_event is None or not cancel_event.is_set()
+
+    def iter_records(self, model, checked_paths, cancel_event=None, on_progress=None, profiler=None):
+        """Yields a record per node of the scan model in tree order, the root first.
+
+        Nodes are stat'ed and checked files read on the reader pool, a bounded number ahead
+        of the one being yielded.
+        """
+        checked = set(checked_paths)
+        if checked:
+            checked.add(model.root)  # Whether or not the caller listed it
+        deduplicate = self.settings['file_content_settings'].get('deduplicate', False)
+        def load_node(path, profiler):
+            try:
+                st = os.lstat(path)
+            except OSError:
+                st = None
+            if path in checked and not model.is_dir(path):
+                return st, self.load_file(path, profiler)
+            return st, (None, None)
+
+        done = 0
+        first_paths = {}
+        paths, record_paths = tee(chain([model.root], model.walk(model.root)))
+        results = self.read_files(paths, cancel_event, profiler, load_node)
+        for path, (_, (st, (content, digest))) in zip(record_paths, results):
+            rel_path = os.path.relpath(path, model.root).replace(os.sep, "/")
+            is_dir = model.is_dir(path) or path in model.unreadable
+            record = {
+                'path': rel_path,
+                'type': 'dir' if is_dir else 'file',
+                'size': st.st_size if st is not None and not is_dir else None,
+                'mtime': st.st_mtime if st is not None else None,
+                'included': path in checked,
+                'content': content,
+            }
+            if path in model.unreadable:
+                record['unreadable'] = True
+            if deduplicate and digest is not None:
+                if digest in first_paths:
+                    record['content'] = None
+                    record['duplicate_of'] = first_paths[digest]
+                else:
+                    first_paths[digest] = rel_path
+            yield record
+            if on_progress and path in checked:
+                done += 1
+                on_progress(done, len(checked))
+
+    def build_tree(self, directory, checked_paths):
+        """Returns the checked items as a NodeTable rooted at directory.
+
+        Paths in tree order find their parent on a stack of the current folder chain, so no
+        relative path is computed or split; others are added from the root down.
+        """
+        table = NodeTable(directory)
+        stack = [(directory, 0)]
+        for path in checked_paths:
+            if path == directory:
+                continue
+            parent = os.path.dirname(path)
+            while stack and stack[-1][0] != parent:
+                stack.pop()
+            if stack:
+                name = os.path.basename(path)
+                node = table.child(stack[-1][1], name)
+                if node is None:
+                    node = table.add(stack[-1][1], name, False)
+            else:
+                node = table.add_path(path, False)
+            stack.append((path, node))
+        return table
+
+    def iter_leaves(self, table, node=0, prefix=""):
+        """Yields (node, relative path) for every item without children, in tree order"""
+        for name, child in table.children.get(node, {}).items():
+            rel_path = os.path.join(prefix, name)
+            if table.children.get(child):
+                yield from self.iter_leaves(table, child, rel_path)
+            else:
+                yield child, rel_path
+
+    def output_cost(self, text):
+        """What text takes out of the output budget"""
+        if self.settings['file_content_settings'].get('budget_unit', 'tokens') == 'bytes':
+            return len(text.encode('utf-8'))
+        return estimate_tokens(text)
+
+    def apply_budget(self, table, leaves, cancel_event=None, profiler=None):
+        """Flags OMITTED the leaves whose contents don't fit the output budget after the tree.
+
+        Files that would be included are stat'ed on the reader pool, ranked by budget_priority
+        and taken whole while their estimated cost fits, smaller ones further down the ranking
+        filling what is left. A file is charged at its size on disk, which its decoded text
+        can't exceed, so the budget holds without opening any file.
+        """
+        content_settings = self.settings['file_content_settings']
+        if not content_settings['include_contents']:
+            return
+        max_bytes = content_settings['max_file_size_kb'] * 1024
+        bytes_unit = content_settings.get('budget_unit', 'tokens') == 'bytes'
+        candidates = [(node, rel_path) for node, rel_path in leaves
+                      if os.path.splitext(rel_path)[1].lower() in self.allowed_extensions]
+        paths = (os.path.join(table.root, rel_path) for _, rel_path in candidates)
+        sizes = [st.st_size if st is not None else None
+                 for _, st in self.read_files(paths, cancel_event, profiler, self.stat_file)]
+
+        ranked = [(node, rel_path, size) for (node, rel_path), size in zip(candidates, sizes)
+                  if size is not None and size <= max_bytes]
+        priority = content_settings.get('budget_priority', 'size')
+        if priority == 'extension':
+            # Earlier in the allowed extensions list first
+            ranks = {}
+            for ext in content_settings['allowed_extensions']:
+                ranks.setdefault(ext.lower(), len(ranks))
+            ranked.sort(key=lambda item: (ranks[os.path.splitext(item[1])[1].lower()], item[2]))
+        elif priority == 'depth':
+            ranked.sort(key=lambda item: (item[1].count(os.sep), item[2]))
+        else:
+            ranked.sort(key=lambda item: item[2])
+
+        # The tree is written whatever the budget. Every file starts out charged for its
+        # omitted marker in the tree, which is given back when its contents are included.
+        tree_size = [0]
+        def measure(text):
+            tree_size[0] += self.output_cost(text)
+        self.write_structure(table, measure)
+        marker = self.output_cost(self.OMITTED_MARK)
+        remaining = (content_settings['budget'] - tree_size[0] - self.output_cost("\n\n# File Contents\n\n")
+                     - marker * len(ranked))
+        omitted = 0
+        for node, rel_path, size in ranked:
+            cost = self.output_cost(f"\n# {rel_path}\n\n") + (size if bytes_unit else (size + 3) // 4)
+            if cost - marker <= remaining:
+                remaining -= cost - marker
+            else:
+                table.flags[node] |= OMITTED
+                omitted += 1
+        if profiler is not None:
+            profiler.count(omitted=omitted)
+
+    def stat_file(self, path, profiler=None):
+        """The stat result of a regular file, None for anything else; a read_files loader"""
+        if profiler is not None:
+            profiler.count(syscalls=1)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st if stat.S_ISREG(st.st_mode) else None
+
+    def compare_snapshot(self, table, leaves, since, record, cancel_event=None, profiler=None):
+        """Flags ADDED and MODIFIED the leaves that changed since the snapshot and adds the files
+        deleted since then to the table, flagged DELETED.
+
+        Every leaf is stat'ed; only files whose size or mtime differ from the snapshot are read
+        and hashed, and those whose text is the same after all count as unchanged. Returns the
+        load_entry results of the modified files by path, so they aren't read again. Unchanged
+        files go to record as they were in the snapshot.
+        """
+        if os.path.abspath(since.root) != os.path.abspath(table.root):
+            raise ValueError(f"The snapshot was taken of {since.root}, not {table.root}")
+        paths = (os.path.join(table.root, rel_path) for _, rel_path in leaves)
+        stats = self.read_files(paths, cancel_event, profiler, self.stat_file)
+        suspects = []
+        for (node, rel_path), (path, st) in zip(leaves, stats):
+            entry = since.get(rel_path)
+            if entry is None:
+                if st is not None:  # Not an empty folder
+                    table.flags[node] |= ADDED
+            elif st is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+                if record is not None:
+                    record.files[since.key(rel_path)] = entry
+            else:
+                suspects.append((node, rel_path, entry))
+
+        # Same size and text under a new mtime (a touch, a checkout) isn't a change
+        preloaded = {}
+        paths = (os.path.join(table.root, rel_path) for _, rel_path, _ in suspects)
+        results = self.read_files(paths, cancel_event, profiler, lambda path, profiler: self.load_entry(path, profiler, True))
+        for (node, rel_path, entry), (path, result) in zip(suspects, results):
+            content, digest, st = result
+            if digest is not None and digest.hex() == entry[2]:
+                if record is not None and st is not None:
+                    record.add(rel_path, st, digest)
+            else:
+                table.flags[node] |= MODIFIED
+                preloaded[path] = result
+
+        checked = {since.key(rel_path) for _, rel_path in leaves}
+        for key in since.files:
+            path = os.path.join(table.root, *key.split("/"))
+            if key not in checked and not os.path.lexists(path):
+                node = table.add_path(path, False)
+                table.flags[node] |= DELETED
+        if profiler is not None:
+            profiler.count(modified=len(preloaded))
+        return preloaded
+
+    def read_files(self, paths, cancel_event=None, profiler=None, loader=None):
+        """Loads file contents on a thread pool, yielding (path, (content or None, digest or None)) in input order.
+
+        loader(path, profiler) replaces load_file to produce other results per path.
+
+        Every read is accounted at max_file_size_kb, and no more than MAX_INFLIGHT_BYTES worth of
+        reads are queued or waiting to be consumed at once.
+        """
+        max_bytes = self.settings['file_content_settings']['max_file_size_kb'] * 1024
+        max_pending = max(1, self.MAX_INFLIGHT_BYTES // max_bytes)
+        cancelled = cancel_event.is_set if cancel_event is not None else lambda: False
+        pending = deque()
+        paths = iter(paths)
+        loader = loader or self.load_file
+        with ThreadPoolExecutor(max_workers=self.READ_WORKERS) as pool:
+            try:
+                while True:
+                    while len(pending) < max_pending and not cancelled():
+                        path = next(paths, None)
+                        if path is None:
+                            break
+                        pending.append((path, pool.submit(loader, path, profiler)))
+                    if not pending or cancelled():
+                        break
+                    path, future = pending.popleft()
+                    yield path, future.result()
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+    def load_file(self, path, profiler=None):
+        """Returns (content to include for a checked path or None, digest or None).
+
+        With the content cache, a file that is unchanged since it was last read costs one stat.
+        Digests are only computed with deduplicate on, for contents that were read successfully,
+        and are kept in the cache along with the content.
+        """
+        content, digest, _ = self.load_entry(path, profiler)
+        return content, digest
+
+    def load_entry(self, path, profiler=None, hash_all=False):
+        """load_file, also returning the stat result the content was checked against, None when
+        the file wasn't stat'ed. hash_all computes digests whether or not deduplicate is on."""
+        content_settings = self.settings['file_content_settings']
+        if not content_settings['include_contents']:
+            return None, None, None
+        if os.path.splitext(path)[1].lower() not in self.allowed_extensions:
+            return None, None, None
+        deduplicate = content_settings.get('deduplicate', False) or hash_all
+
+        max_bytes = content_settings['max_file_size_kb'] * 1024
+        cache = self.content_cache
+        if cache is not None:
+            if profiler is not None:
+                profiler.count(syscalls=1)
+            try:
+                st = os.stat(path)
+            except OSError as e:
+                return f"Error reading file: {str(e)}", None, None
+            if not stat.S_ISREG(st.st_mode):
+                return None, None, None
+            if st.st_size > max_bytes:
+                return None, None, st
+            hit, content, digest = cache.get(path, st.st_size, st.st_mtime_ns)
+            if hit:
+                if deduplicate and digest is None and content is not None:
+                    digest = self.digest(content)
+                    cache.put(path, st.st_size, st.st_mtime_ns, content, digest)
+                return content, digest, st
+
+        content, st = self.read_file(path, max_bytes, profiler)
+        digest = None
+        if st is not None:
+            if deduplicate and content is not None:
+                digest = self.digest(content)
+            if cache is not None:
+                cache.put(path, st.st_size, st.st_mtime_ns, content, digest)
+        return content, digest, st
+
+    @staticmethod
+    def digest(content):
+        """Identifies a file body for deduplication"""
+        return hashlib.blake2b(content.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    def read_file(self, path, max_bytes, profiler=None):
+        """Reads a text file with a single open, returning (content or None, fstat result or None).
+
+        fstat gives the size, the first block is sniffed for binary data and the rest is
+        decoded incrementally, never reading past max_bytes. The stat result is None when
+        the outcome shouldn't be cached (errors, too large).
+        """
+        reads = [0, 0]  # read calls, bytes read
+        def read(f, size):
+            block = f.read(size)
+            reads[0] += 1
+            reads[1] += len(block)
+            return block
+        try:
+            with open(path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                if not stat.S_ISREG(st.st_mode) or st.st_size > max_bytes:
+                    return None, None
+                block = read(f, self.SNIFF_BYTES)
+                if b"\0" in block:
+                    return None, st  # Binary content, whatever the extension says
+                # Same newline handling as reading in text mode
+                decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')(), translate=True)
+                parts = []
+                size = 0
+                while block:
+                    size += len(block)
+                    if size > max_bytes:
+                        return None, None  # Grew past the limit since fstat
+                    parts.append(decoder.decode(block))
+                    block = read(f, self.READ_BLOCK)
+                parts.append(decoder.decode(b"", final=True))
+                return "".join(parts), st
+        except OSError as e:
+            if os.path.isdir(path):
+                return None, None
+            return f"Error reading file: {str(e)}", None
+        except UnicodeDecodeError as e:
+            return f"Error reading file: {str(e)}", None
+        finally:
+            if profiler is not None:
+                # open, fstat and close around the reads
+                profiler.count(files_read=1, bytes_read=reads[1], syscalls=3 + reads[0])
+
+    def write_structure(self, table, write, nodes=(0,), indent=""):
+        """Writes the tree section, one line per item"""
+        for i, node in enumerate(nodes):
+            is_last = (i == len(nodes) - 1)
+            branch = "└── " if is_last else "├── "
+            spacer = "    " if is_last else "│   "
+
+            name = table.names[node] if node else os.path.basename(table.root)
+            flags = table.flags[node]
+            mark = "".join(text for flag, text in self.CHANGE_MARKS.items() if flags & flag)
+            if flags & OMITTED:
+                mark += self.OMITTED_MARK
+            write(f"{indent}{branch}{name}{mark}\n")
+            # Recurse for directories
+            self.write_structure(table, write, table.child_nodes(node), indent + spacer)
@@ -0,0 +1,68 @@
+"""Structured export formats, written record by record from StructureEngine.iter_records.
+
+Each record describes one scanned node:
+{"path": "src/app.py", "type": "file", "size": 1234, "mtime": 1700000000.0, "included": true, "content": "..."}
+where path is relative to the root ("." for the root itself) with "/" separators, included
+tells whether the node is checked, and content is only set for included text files. With
+deduplication a repeated body is replaced by "duplicate_of": first path. Folders the scan
+couldn't list have "type": "dir" and "unreadable": true.
+"""
+import gzip
+import json
+import posixpath
+
+# Format by file extension, a trailing .gz compresses any of them
+FORMATS = {'.txt': 'text', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.json': 'json'}
+
+
+def format_for(file_path, default='text'):
+    """Returns (format, compressed) for an output file name such as export.ndjson.gz"""
+    name = file_path.lower()
+    compressed = name.endswith(".gz")
+    if compressed:
+        name = name[:-3]
+    return FORMATS.get(posixpath.splitext(name)[1], default), compressed
+
+
+def open_output(file_path, compressed):
+    """Opens a text file for writing, gzip-compressed on the fly when asked"""
+    if compressed:
+        return gzip.open(file_path, "wt", encoding="utf-8", newline="")
+    return open(file_path, "w", encoding="utf-8", newline="")
+
+
+def write_ndjson(records, write):
+    """One JSON object per line, in tree order"""
+    for record in records:
+        write(json.dumps(record, ensure_ascii=False))
+        write("\n")
+
+
+def write_json_tree(records, write, root_name):
+    """A single nested object for the root folder, each folder holding a "children" list.
+
+    Records arrive in tree order, so only the chain of open folders is kept in memory.
+    """
+    open_folders = []  # paths of the folders whose children list is still open
+    separator = ""
+    for record in records:
+        path = record['path']
+        parent = (posixpath.dirname(path) or ".") if path != "." else None
+        while open_folders and open_folders[-1] != parent:
+            write("]}")
+            open_folders.pop()
+            separator = ", "
+
+        text = json.dumps(dict(record, name=posixpath.basename(path) if path != "." else root_name), ensure_ascii=False)
+        if record['type'] == 'dir':
+            # Left open, the children follow
+            write(f'{separator}{text[:-1]}, "children": [')
+            open_folders.append(path)
+            separator = ""
+        else:
+            write(separator + text)
+            separator = ", "
+    while open_folders:
+        write("]}")
+        open_folders.pop()
+    write("\n")
@@ -0,0 +1,1126 @@
+import os
+import time
+import threading
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+from queue import Queue, SimpleQueue, Empty
+from contextlib import contextmanager
+
+from engine import ScanModel, StructureEngine, data_dir_for, load_settings, save_settings
+from selection import ALL, NONE, PARTIAL, SelectionModel
+from profiler import Profiler
+from export import format_for, open_output
+from watcher import Watcher
+from nodes import PLACEHOLDER, NodeTable
+from search_index import SearchIndex
+from preview import OutputBuffer, PreviewPane
+from snapshot import Snapshot, snapshot_file_for
+
+class SettingsDialog(tk.Toplevel):
+    def __init__(self, parent, settings):
+        super().__init__(parent)
+        self.title("Settings")
+        self.geometry("400x600")
+        self.resizable(False, False)
+        
+        # Make dialog modal
+        self.transient(parent)
+        self.grab_set()
+        
+        # Create main frame with scrollbar
+        container = ttk.Frame(self)
+        container.pack(fill=tk.BOTH, expand=True)
+        
+        canvas = tk.Canvas(container)
+        scrollbar = ttk.Scrollbar(container, orient="vertical", command=canvas.yview)
+        
+        self.main_frame = ttk.Frame(canvas)
+        self.main_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
+        
+        canvas.create_window((0, 0), window=self.main_frame, anchor="nw")
+        canvas.configure(yscrollcommand=scrollbar.set)
+        
+        # Pack scrollable elements
+        canvas.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        
+        # Settings sections
+        self.create_ignored_folders_section(settings.get('ignored_folders', []))
+        self.create_file_content_section(settings.get('file_content_settings', {}))
+        self.create_cache_section(settings.get('content_cache', {}))
+        self.create_tree_section(settings)
+        
+        # Save button
+        ttk.Button(self.main_frame, text="Save", command=self.save_settings).pack(pady=10)
+        
+        self.result = None
+        
+    def create_ignored_folders_section(self, ignored_folders):
+        # Ignored folders section, entries use .gitignore syntax (build*/, *.min.js, !keep.txt)
+        ttk.Label(self.main_frame, text="Ignored Folders and Patterns:", font=('TkDefaultFont', 10, 'bold')).pack(anchor=tk.W, pady=(10,5))
+        
+        # Listbox with scrollbar
+        list_frame = ttk.Frame(self.main_frame)
+        list_frame.pack(fill=tk.BOTH, expand=True, pady=(5, 10))
+        
+        self.listbox = tk.Listbox(list_frame, selectmode=tk.SINGLE, height=6)
+        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.listbox.yview)
+        self.listbox.configure(yscrollcommand=scrollbar.set)
+        
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # Populate listbox
+        for folder in ignored_folders:
+            self.listbox.insert(tk.END, folder)
+        
+        # Input frame
+        input_frame = ttk.Frame(self.main_frame)
+        input_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        self.folder_entry = ttk.Entry(input_frame)
+        self.folder_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 5))
+        
+        ttk.Button(input_frame, text="Add", command=self.add_folder).pack(side=tk.LEFT)
+        ttk.Button(input_frame, text="Remove Selected", command=self.remove_selected).pack(side=tk.LEFT, padx=5)
+
+    def create_file_content_section(self, content_settings):
+        # File content settings section
+        ttk.Label(self.main_frame, text="File Content Settings:", font=('TkDefaultFont', 10, 'bold')).pack(anchor=tk.W, pady=(10,5))
+        
+        # Include file contents checkbox
+        self.include_contents = tk.BooleanVar(value=content_settings.get('include_contents', False))
+        ttk.Checkbutton(self.main_frame, text="Include file contents", variable=self.include_contents).pack(anchor=tk.W)
+        
+        # Max file size frame
+        size_frame = ttk.Frame(self.main_frame)
+        size_frame.pack(fill=tk.X, pady=5)
+        
+        ttk.Label(size_frame, text="Max file size (KB):").pack(side=tk.LEFT)
+        self.max_size = tk.StringVar(value=str(content_settings.get('max_file_size_kb', 100)))
+        ttk.Entry(size_frame, textvariable=self.max_size, width=10).pack(side=tk.LEFT, padx=5)
+        
+        # Identical files are written once, later copies point to the first one
+        self.deduplicate = tk.BooleanVar(value=content_settings.get('deduplicate', False))
+        ttk.Checkbutton(self.main_frame, text="Write identical file contents only once", variable=self.deduplicate).pack(anchor=tk.W)
+        
+        # Output budget, files that don't fit are only listed in the tree
+        budget_frame = ttk.Frame(self.main_frame)
+        budget_frame.pack(fill=tk.X, pady=5)
+        
+        ttk.Label(budget_frame, text="Output budget (0 for none):").pack(side=tk.LEFT)
+        self.budget = tk.StringVar(value=str(content_settings.get('budget', 0)))
+        ttk.Entry(budget_frame, textvariable=self.budget, width=10).pack(side=tk.LEFT, padx=5)
+        self.budget_unit = tk.StringVar(value=content_settings.get('budget_unit', 'tokens'))
+        ttk.Combobox(budget_frame, textvariable=self.budget_unit, values=('tokens', 'bytes'),
+                     state="readonly", width=7).pack(side=tk.LEFT)
+        
+        priority_frame = ttk.Frame(self.main_frame)
+        priority_frame.pack(fill=tk.X)
+        
+        ttk.Label(priority_frame, text="Budget goes first to:").pack(side=tk.LEFT)
+        self.budget_priority = tk.StringVar(value=content_settings.get('budget_priority', 'size'))
+        for text, value in (("Smaller files", 'size'), ("Extension order", 'extension'), ("Shallower files", 'depth')):
+            ttk.Radiobutton(priority_frame, text=text, variable=self.budget_priority, value=value).pack(side=tk.LEFT)
+        
+        # Allowed extensions
+        ttk.Label(self.main_frame, text="Allowed Extensions:").pack(anchor=tk.W, pady=(10,5))
+        
+        extensions_frame = ttk.Frame(self.main_frame)
+        extensions_frame.pack(fill=tk.BOTH, expand=True)
+        
+        self.extensions_text = tk.Text(extensions_frame, height=4, width=40)
+        extensions_scroll = ttk.Scrollbar(extensions_frame, command=self.extensions_text.yview)
+        self.extensions_text.configure(yscrollcommand=extensions_scroll.set)
+        
+        self.extensions_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        extensions_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # Set default extensions
+        default_extensions = content_settings.get('allowed_extensions', ['.txt', '.py', '.js', '.html', '.css', '.md', '.json', '.xml', '.yaml', '.yml'])
+        self.extensions_text.insert('1.0', '\n'.join(default_extensions))
+
+    def create_cache_section(self, cache_settings):
+        ttk.Label(self.main_frame, text="Content Cache:", font=('TkDefaultFont', 10, 'bold')).pack(anchor=tk.W, pady=(10,5))
+        
+        # Unchanged files are served from memory on the next generation
+        memory_frame = ttk.Frame(self.main_frame)
+        memory_frame.pack(fill=tk.X, pady=5)
+        
+        ttk.Label(memory_frame, text="Memory budget (MB, 0 disables):").pack(side=tk.LEFT)
+        self.cache_memory = tk.StringVar(value=str(cache_settings.get('memory_mb', 64)))
+        ttk.Entry(memory_frame, textvariable=self.cache_memory, width=10).pack(side=tk.LEFT, padx=5)
+        
+        self.cache_persist = tk.BooleanVar(value=cache_settings.get('persist', False))
+        ttk.Checkbutton(self.main_frame, text="Keep cached contents on disk between runs", variable=self.cache_persist).pack(anchor=tk.W)
+        
+        # The oldest cached contents are dropped from disk past this size
+        disk_frame = ttk.Frame(self.main_frame)
+        disk_frame.pack(fill=tk.X, pady=5)
+        
+        ttk.Label(disk_frame, text="Disk budget (MB):").pack(side=tk.LEFT)
+        self.cache_disk = tk.StringVar(value=str(cache_settings.get('disk_mb', 256)))
+        ttk.Entry(disk_frame, textvariable=self.cache_disk, width=10).pack(side=tk.LEFT, padx=5)
+
+    def create_tree_section(self, settings):
+        ttk.Label(self.main_frame, text="Tree Settings:", font=('TkDefaultFont', 10, 'bold')).pack(anchor=tk.W, pady=(10,5))
+        
+        # .gitignore and .ignore files found while scanning add their own patterns
+        self.use_ignore_files = tk.BooleanVar(value=settings.get('use_ignore_files', True))
+        ttk.Checkbutton(self.main_frame, text="Apply .gitignore and .ignore files", variable=self.use_ignore_files).pack(anchor=tk.W)
+        
+        # Lazy tree only creates the items of a folder when it is expanded
+        self.lazy_tree = tk.BooleanVar(value=settings.get('lazy_tree', True))
+        ttk.Checkbutton(self.main_frame, text="Load folder contents on expand", variable=self.lazy_tree).pack(anchor=tk.W)
+        
+        # Scan index reuses the listing of folders that haven't changed since the last scan
+        self.scan_index = tk.BooleanVar(value=settings.get('scan_index', True))
+        ttk.Checkbutton(self.main_frame, text="Remember folder listings between scans", variable=self.scan_index).pack(anchor=tk.W)
+        
+        # Listing folders in parallel hides network round-trips, 1 lists them one at a time
+        workers_frame = ttk.Frame(self.main_frame)
+        workers_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(workers_frame, text="Parallel folder listings (1 for local disks):").pack(side=tk.LEFT)
+        self.scan_workers = tk.StringVar(value=str(settings.get('scan_workers', 1)))
+        ttk.Entry(workers_frame, textvariable=self.scan_workers, width=10).pack(side=tk.LEFT, padx=5)
+        
+        # Watch mode keeps the tree up to date with changes on disk
+        self.watch_mode = tk.BooleanVar(value=settings.get('watch_mode', False))
+        ttk.Checkbutton(self.main_frame, text="Watch for changes", variable=self.watch_mode).pack(anchor=tk.W)
+        
+        # cProfile is costly, it only runs for the next scan or generation
+        self.profile_next_run = tk.BooleanVar(value=settings.get('profile_next_run', False))
+        ttk.Checkbutton(self.main_frame, text="Profile the next scan or generation with cProfile", variable=self.profile_next_run).pack(anchor=tk.W)
+
+    def add_folder(self):
+        folder = self.folder_entry.get().strip()
+        if folder:
+            self.listbox.insert(tk.END, folder)
+            self.folder_entry.delete(0, tk.END)
+            
+    def remove_selected(self):
+        selection = self.listbox.curselection()
+        if selection:
+            self.listbox.delete(selection)
+            
+    def save_settings(self):
+        try:
+            max_size = int(self.max_size.get())
+            if max_size <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "Max file size must be a positive number")
+            return
+        
+        try:
+            budget = int(self.budget.get())
+            if budget < 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "Output budget must be zero or a positive number")
+            return
+        
+        try:
+            scan_workers = int(self.scan_workers.get())
+            if scan_workers < 1:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "Parallel folder listings must be a positive number")
+            return
+        
+        try:
+            cache_memory = int(self.cache_memory.get())
+            if cache_memory < 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "Cache memory budget must be zero or a positive number")
+            return
+        
+        try:
+            cache_disk = int(self.cache_disk.get())
+            if cache_disk <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "Cache disk budget must be a positive number")
+            return
+            
+        extensions = [ext.strip() for ext in self.extensions_text.get('1.0', tk.END).split('\n') if ext.strip()]
+        
+        self.result = {
+            'ignored_folders': list(self.listbox.get(0, tk.END)),
+            'use_ignore_files': self.use_ignore_files.get(),
+            'lazy_tree': self.lazy_tree.get(),
+            'scan_index': self.scan_index.get(),
+            'scan_workers': scan_workers,
+            'watch_mode': self.watch_mode.get(),
+            'profile_next_run': self.profile_next_run.get(),
+            'file_content_settings': {
+                'include_contents': self.include_contents.get(),
+                'max_file_size_kb': max_size,
+                'deduplicate': self.deduplicate.get(),
+                'budget': budget,
+                'budget_unit': self.budget_unit.get(),
+                'budget_priority': self.budget_priority.get(),
+                'allowed_extensions': extensions
+            },
+            'content_cache': {
+                'memory_mb': cache_memory,
+                'persist': self.cache_persist.get(),
+                'disk_mb': cache_disk
+            }
+        }
+        self.destroy()
+
+
+class DirectoryStructureApp:
+    # Scan results are sent to the UI at most once per frame and applied within a time budget
+    FRAME_MS = 16
+    FRAME_INTERVAL = FRAME_MS / 1000
+    APPLY_BUDGET = 0.010
+    WATCH_POLL_MS = 250
+    CHECK_MARKS = {NONE: "☐", PARTIAL: "▣", ALL: "☑"}
+    # Characters of generated output written between preview refreshes
+    PREVIEW_CHUNK = 64 * 1024
+    # Search: typing pause before the tree is filtered, and matches shown in the filtered tree
+    SEARCH_DELAY_MS = 150
+    MAX_SHOWN_MATCHES = 1000
+    # Appended to the names of folders the scan couldn't list
+    UNREADABLE_MARK = " (unreadable)"
+    EXPORT_FILETYPES = [
+        ("Text Files", "*.txt"), ("NDJSON, one record per line", "*.ndjson"), ("JSON tree", "*.json"),
+        ("Compressed", "*.gz"), ("All Files", "*.*")]
+
+    def __init__(self, root, settings_file="directory_settings.json"):
+        self.root = root
+        self.root.title("Directory Structure Generator")
+        self.root.geometry("800x650")
+        
+        # Load settings
+        self.settings_file = settings_file
+        self.settings = load_settings(self.settings_file)
+        self.settings.pop('scan_counts', None)  # Older versions kept them here, now in the data folder
+        self.engine = StructureEngine(self.settings, data_dir_for(self.settings_file))
+        
+        # Container principal
+        self.main_container = tk.Frame(self.root)
+        self.main_container.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        # Top frame with directory selection and settings
+        self.top_frame = tk.Frame(self.main_container)
+        self.top_frame.pack(fill=tk.X, pady=5)
+        
+        self.dir_label = tk.Label(self.top_frame, text="No directory selected.", wraplength=700)
+        self.dir_label.pack(side=tk.LEFT)
+        
+        self.settings_button = tk.Button(self.top_frame, text="Settings", command=self.show_settings)
+        self.settings_button.pack(side=tk.RIGHT, padx=5)
+        
+        self.trace_button = tk.Button(self.top_frame, text="Export Trace", command=self.export_trace)
+        self.trace_button.pack(side=tk.RIGHT, padx=5)
+        
+        self.select_button = tk.Button(self.top_frame, text="Select Directory", command=self.select_directory)
+        self.select_button.pack(side=tk.RIGHT, padx=5)
+        
+        # Status frame with progress bar
+        self.status_frame = tk.Frame(self.main_container)
+        self.status_frame.pack(fill=tk.X, pady=5)
+        
+        self.progress_var = tk.DoubleVar()
+        self.progress_bar = ttk.Progressbar(self.status_frame, variable=self.progress_var, maximum=100)
+        self.progress_bar.pack(fill=tk.X, pady=5)
+        
+        self.status_label = tk.Label(self.status_frame, text="")
+        self.status_label.pack(fill=tk.X)
+        
+        # Only shown while a structure is being generated
+        self.cancel_button = tk.Button(self.status_frame, text="Cancel", command=self.cancel_generation)
+        
+        # Ocultar frame de status inicialmente
+        self.status_frame.pack_forget()
+        
+        # Search box filtering the tree
+        self.search_frame = tk.Frame(self.main_container)
+        self.search_frame.pack(fill=tk.X)
+        
+        tk.Label(self.search_frame, text="Search:").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", self.on_search_changed)
+        self.search_entry = tk.Entry(self.search_frame, textvariable=self.search_var)
+        self.search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        
+        self.check_matches_button = tk.Button(self.search_frame, text="Check All Matches", command=self.check_all_matches)
+        self.check_matches_button.pack(side=tk.RIGHT, padx=5)
+        
+        self.search_status = tk.Label(self.search_frame, text="")
+        self.search_status.pack(side=tk.RIGHT)
+        
+        # Frame da árvore
+        self.tree_frame = tk.Frame(self.main_container)
+        self.tree_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        
+        self.treeview = ttk.Treeview(self.tree_frame, columns=("Checked"), selectmode="none")
+        self.treeview.heading("#0", text="Name")
+        self.treeview.heading("Checked", text="")
+        self.treeview.column("Checked", width=50, anchor="center")
+        self.treeview.column("#0", stretch=tk.YES)
+        
+        self.tree_scroll = ttk.Scrollbar(self.tree_frame, orient="vertical", command=self.treeview.yview)
+        self.treeview.configure(yscroll=self.tree_scroll.set)
+        
+        self.treeview.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.tree_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # Frame inferior
+        self.bottom_frame = tk.Frame(self.main_container)
+        self.bottom_frame.pack(fill=tk.X, pady=5)
+        
+        self.generate_button = tk.Button(self.bottom_frame, text="Generate Structure", 
+                                       command=self.generate_structure, state=tk.NORMAL)
+        self.generate_button.pack(pady=5)
+        
+        # Every generated structure is recorded, so the next one can hold only what changed
+        self.changes_only = tk.BooleanVar(value=False)
+        tk.Checkbutton(self.bottom_frame, text="Only changes since the last generated structure",
+                       variable=self.changes_only).pack()
+        
+        # Shows only the lines on screen, read back from the generated output
+        self.preview = PreviewPane(self.bottom_frame, height=15)
+        self.preview.pack(fill=tk.BOTH, expand=True, pady=5)
+        self.preview.on_render = self.count_preview_render
+        
+        self.save_button = tk.Button(self.bottom_frame, text="Save Structure", 
+                                   command=self.save_structure, state=tk.DISABLED)
+        self.save_button.pack(side=tk.RIGHT, padx=5)
+
+        self.copy_button = tk.Button(self.bottom_frame, text="Copy", 
+                                   command=self.copy_text, state=tk.DISABLED)
+        self.copy_button.pack(pady=5)
+        self.copy_button.pack(side=tk.RIGHT, padx=5)
+        
+        self.selected_directory = None
+        # OutputBuffer holding the last generated structure
+        self.output_file = None
+        self.processed_items = 0
+        
+        self.treeview.tag_configure('checked', image='')
+        self.treeview.tag_configure('unchecked', image='')
+        self.treeview.bind('<Button-1>', self.toggle_check)
+        self.treeview.bind('<<TreeviewOpen>>', self.on_tree_open)
+        
+        # Treeview items by node, folders flagged PLACEHOLDER until they are expanded
+        self.nodes = None
+        self.scan_model = None
+        self.selection = None
+        
+        # Name search over the scanned items; while a filter is shown, the items it detached
+        # as (item, parent, index) and the folders it opened
+        self.search_index = None
+        self.search_job = None
+        self.filter_detached = []
+        self.filter_opened = []
+        
+        self.queue = Queue()
+        # Bumped for every new scan, results tagged with an older one are dropped
+        self.scan_generation = 0
+        # Folders the user expanded before they were scanned, listed ahead of the rest
+        self.scan_priority = SimpleQueue()
+        self.generate_queue = Queue()
+        
+        # Optional live watching of the scanned folders, started once a scan is complete
+        self.watch_queue = Queue()
+        self.watcher = None
+        self.scan_done = False
+        self.cancel_event = None
+        
+        # Profilers of the last scan and generation, and a running count of Treeview/Text calls
+        self.profilers = {}
+        self.tk_calls = 0
+
+    def save_settings(self):
+        save_settings(self.settings_file, self.settings)
+            
+    def show_settings(self):
+        dialog = SettingsDialog(self.root, self.settings)
+        self.root.wait_window(dialog)
+        if dialog.result is not None:
+            self.settings.update(dialog.result)
+            self.save_settings()
+            if self.settings.get('watch_mode') and self.watcher is None and self.scan_done:
+                self.start_watcher()
+            elif not self.settings.get('watch_mode'):
+                self.stop_watcher()
+
+    def update_progress(self, value, status_text=""):
+        self.progress_var.set(value)
+        if status_text:
+            self.status_label.config(text=status_text)
+        self.root.update_idletasks()
+
+    def process_directory(self, directory, generation, profiler, priority):
+        """Scans directory on a worker thread, stopping as soon as a newer scan was started"""
+        remembered = self.engine.remembered_count(directory)
+        processed_items = 0
+        total_items = remembered or 0
+        scanned_dirs = 0
+        discovered_dirs = 1
+        batch = []
+        last_flush = time.perf_counter()
+        error = None
+
+        try:
+            with profiler.capture(), profiler.phase("walk"):
+                for root, dirs, files in self.engine.scan_directory(directory, profiler, priority):
+                    if generation != self.scan_generation:
+                        return  # Superseded, the results would land in another tree
+                    batch.append((root, dirs, files))
+
+                    scanned_dirs += 1
+                    discovered_dirs += len(dirs)
+                    processed_items += len(files) + 1
+                    total_items = self.engine.estimate_total(
+                        processed_items, scanned_dirs, discovered_dirs - scanned_dirs, remembered)
+
+                    # Send at most one batch (with a single progress update) per UI frame
+                    now = time.perf_counter()
+                    if now - last_flush >= self.FRAME_INTERVAL:
+                        self.queue.put((generation, 'nodes', (batch, self.scan_progress(processed_items, total_items))))
+                        batch = []
+                        last_flush = now
+            profiler.count(items=processed_items)
+            self.queue.put((generation, 'nodes', (batch, self.scan_progress(processed_items, total_items))))
+        except Exception as e:
+            error = str(e)
+        finally:
+            # Always sent, or the UI would wait for this scan forever
+            self.queue.put((generation, 'done', (directory, processed_items, error)))
+
+    def scan_progress(self, processed_items, total_items):
+        if not total_items:
+            return 100, f"Processed {processed_items} items"  # Nothing found, e.g. an unreadable or deleted root
+        progress = (processed_items / total_items) * 100
+        return progress, f"Processed {processed_items} of ~{int(total_items)} items"
+
+    def process_queue(self, generation):
+        """Applies worker messages on the Tk thread, spending at most APPLY_BUDGET per frame"""
+        if generation != self.scan_generation:
+            return  # A newer scan runs its own loop
+        deadline = time.perf_counter() + self.APPLY_BUDGET
+        progress = None
+        done = False
+        while not done and time.perf_counter() < deadline:
+            try:
+                msg_generation, msg_type, data = self.queue.get_nowait()
+            except Empty:
+                break
+            if msg_generation != generation:
+                continue  # Left over from a cancelled scan
+
+            if msg_type == 'nodes':
+                nodes, progress = data
+                with self.tk_phase(self.profilers['scan'], "apply"):
+                    for path, dirs, files in nodes:
+                        self.apply_listing(path, dirs, files)
+            elif msg_type == 'done':
+                # Remember the item count so the next scan of this folder has an exact total
+                directory, count, error = data
+                self.processed_items = count
+                if error is None:
+                    self.mark_unreadable(self.scan_model.find_unreadable())
+                    self.engine.remember_count(directory, count)
+                    self.show_summary(self.profilers['scan'])
+                else:
+                    self.update_progress(100, f"Scan stopped: {error}")
+                self.scan_done = True
+                if self.settings.get('watch_mode'):
+                    self.start_watcher()
+                done = True
+
+        # Progress updates are coalesced, only the latest one is shown
+        if progress is not None and not done:
+            self.update_progress(*progress)
+        if not done:
+            self.root.after(self.FRAME_MS, self.process_queue, generation)
+
+    def select_directory(self):
+        directory = filedialog.askdirectory()
+        if directory:
+            self.open_directory(directory)
+        else:
+            messagebox.showwarning("Warning", "No directory was selected.")
+
+    def open_directory(self, directory):
+        """Clears the tree and starts scanning directory; scan_done is set once it is complete"""
+        self.selected_directory = directory
+        self.dir_label.config(text=f"Selected Directory: {self.selected_directory}")
+        
+        # Reset
+        self.stop_watcher()
+        self.scan_done = False
+        self.treeview.delete(*self.treeview.get_children())
+        self.nodes = NodeTable(self.selected_directory)
+        self.search_index = SearchIndex(self.selected_directory)
+        self.filter_detached.clear()
+        self.filter_opened.clear()
+        self.search_status.config(text="")
+        self.scan_model = ScanModel(self.selected_directory)
+        self.selection = SelectionModel(self.scan_model)
+        
+        # Show progress frame
+        self.status_frame.pack(after=self.top_frame, fill=tk.X, pady=5)
+        self.update_progress(0, "Scanning...")
+        
+        # Start processing; a running scan stops once it sees the new generation
+        self.scan_generation += 1
+        self.scan_priority = SimpleQueue()
+        profiler = Profiler("scan", self.cprofile_file("scan"))
+        self.profilers['scan'] = profiler
+        threading.Thread(target=self.process_directory, daemon=True, args=(
+            directory, self.scan_generation, profiler, self.scan_priority)).start()
+        self.root.after(self.FRAME_MS, self.process_queue, self.scan_generation)
+
+    def apply_listing(self, path, dirs, files):
+        """Adds a scanned folder to the model and updates its Treeview item if it exists"""
+        old_children = self.scan_model.children(path) if self.scan_model.is_dir(path) else None
+        was_unreadable = path in self.scan_model.unreadable
+        self.scan_model.add_directory(path, dirs, files)
+        self.selection.update_listing(path, old_children)
+        self.search_index.update_listing(path, dirs, files)
+        if path == self.scan_model.root and old_children is None:
+            self.insert_item(None, os.path.basename(path), path, True)
+
+        node = self.nodes.find(path)
+        if node is None:
+            return
+        if was_unreadable:
+            # Readable again, handled like a folder whose listing just arrived
+            self.treeview.item(str(node), text=self.nodes.names[node])
+            self.treeview.insert(str(node), "end", iid=f"p{node}", text="")
+            self.nodes.flags[node] |= PLACEHOLDER
+            self.tk_calls += 2
+        if not self.nodes.flags[node] & PLACEHOLDER:
+            if old_children is not None:
+                self.update_children(node, old_children)
+        elif not dirs and not files:
+            # Empty folder, drop the expand arrow
+            self.treeview.delete(f"p{node}")
+            self.nodes.flags[node] &= ~PLACEHOLDER
+            self.tk_calls += 1
+        elif self.treeview.item(str(node), "open") or not self.settings.get('lazy_tree', True):
+            self.materialize_children(node)
+
+    def update_children(self, node, old_children):
+        """Inserts and deletes the items of a materialized folder whose listing changed"""
+        # Keyed by type too, so a folder replaced by a file of the same name (or the reverse) is replaced
+        new_children = self.scan_model.children(self.nodes.path(node))
+        new_items = {(name, is_dir) for name, _, is_dir in new_children}
+        old_items = {(name, is_dir) for name, _, is_dir in old_children}
+        
+        for name, _ in old_items - new_items:
+            child = self.nodes.child(node, name)
+            if child is not None:
+                self.remove_item(child)
+        
+        for index, (name, path, is_dir) in enumerate(new_children):
+            if (name, is_dir) not in old_items:
+                self.insert_item(node, name, path, is_dir, index)
+
+    def remove_item(self, node):
+        self.treeview.delete(str(node))
+        self.tk_calls += 1
+        self.nodes.remove(node)
+
+    def insert_item(self, parent, name, path, is_dir, index="end"):
+        """Inserts the Treeview item of a path below the item of parent (None for the root); returns its node.
+
+        Items are named after their node in self.nodes and placeholders after their folder's
+        node, so no item id or path has to be stored.
+        """
+        if parent is None:
+            node, parent_id = 0, ""
+        else:
+            node, parent_id = self.nodes.add(parent, name, is_dir), str(parent)
+        unreadable = path in self.scan_model.unreadable
+        self.treeview.insert(parent_id, index, iid=str(node), text=name + self.UNREADABLE_MARK if unreadable else name,
+                             open=False, values=(self.check_mark(path),))
+        self.tk_calls += 1
+        if is_dir and not unreadable and (not self.scan_model.is_dir(path) or self.scan_model.children(path)):
+            # Placeholder child keeps the expand arrow until the folder is opened
+            self.treeview.insert(str(node), "end", iid=f"p{node}", text="")
+            self.nodes.flags[node] |= PLACEHOLDER
+            self.tk_calls += 1
+        return node
+
+    def mark_unreadable(self, paths):
+        """Drops the expand arrow of folders the scan couldn't list and labels them"""
+        for path in paths:
+            node = self.nodes.find(path)
+            if node is None:
+                continue
+            if self.nodes.flags[node] & PLACEHOLDER:
+                self.treeview.delete(f"p{node}")
+                self.nodes.flags[node] &= ~PLACEHOLDER
+            self.treeview.item(str(node), text=self.nodes.names[node] + self.UNREADABLE_MARK)
+            self.tk_calls += 2
+
+    def item_node(self, item):
+        """The node of a Treeview item, None for placeholders and empty ids"""
+        return int(item) if item and item[0] != "p" else None
+
+    def materialize_children(self, node):
+        """Replaces the placeholder of a folder item with its real children from the scan model"""
+        if not self.nodes.flags[node] & PLACEHOLDER:
+            return  # Already materialized
+        path = self.nodes.path(node)
+        if not self.scan_model.is_dir(path):
+            # Not scanned yet, done when its listing arrives
+            if not self.scan_done:
+                self.scan_priority.put(path)
+            return
+        self.treeview.delete(f"p{node}")
+        self.nodes.flags[node] &= ~PLACEHOLDER
+        self.tk_calls += 1
+        lazy = self.settings.get('lazy_tree', True)
+        for name, child_path, is_dir in self.scan_model.children(path):
+            child = self.insert_item(node, name, child_path, is_dir)
+            if is_dir and not lazy:
+                self.materialize_children(child)
+
+    def start_watcher(self):
+        """Watches the scanned folders and applies their changes to the tree as they happen"""
+        watcher = Watcher(self.engine, self.scan_model.root, dict(self.scan_model.listings),
+                          lambda *changes: self.watch_queue.put((watcher, changes)))
+        self.watcher = watcher
+        watcher.start()
+        self.root.after(self.WATCH_POLL_MS, self.process_watch_queue)
+
+    def stop_watcher(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+
+    def process_watch_queue(self):
+        if self.watcher is None:
+            return
+        while True:
+            try:
+                watcher, changes = self.watch_queue.get_nowait()
+            except Empty:
+                break
+            if watcher is self.watcher:  # Ignore batches from a watcher that was stopped
+                self.apply_changes(*changes)
+        self.root.after(self.WATCH_POLL_MS, self.process_watch_queue)
+
+    def apply_changes(self, listings, removed, modified):
+        for path, dirs, files in listings:
+            self.apply_listing(path, dirs, files)
+        self.mark_unreadable(self.scan_model.find_unreadable([path for path, _, _ in listings]))
+        # Dropped last, the selection model still needed the removed subtrees above. The search
+        # index already dropped them with their parent's listing, and the path may now be a file.
+        for path in removed:
+            self.scan_model.remove_tree(path)
+        
+        # Keep a generated structure in sync when something it covers changed
+        if self.output_file is not None and self.cancel_event is None:
+            checked = set(self.get_checked_items())
+            changed = [path for path, _, _ in listings] + removed + modified
+            if any(path in checked for path in changed):
+                # The user hasn't seen this output yet, so the snapshot baseline stays where it was
+                self.generate_structure(record_snapshot=False)
+
+    def on_tree_open(self, event):
+        item = self.treeview.focus()
+        node = self.item_node(item)
+        if node is None:
+            return
+        self.materialize_children(node)
+        # Rows inside a collapsed folder aren't repainted when check marks change
+        self.refresh_check_marks(self.treeview.get_children(item))
+
+    def toggle_check(self, event):
+        """Handles the checkbox toggle when clicking on an item"""
+        region = self.treeview.identify_region(event.x, event.y)
+        if region == "cell":
+            column = self.treeview.identify_column(event.x)
+            if column == "#1":  # Checkbox column
+                item = self.treeview.identify_row(event.y)
+                node = self.item_node(item)
+                if node is None:
+                    return
+                path = self.nodes.path(node)
+                # Partially checked items become fully checked
+                self.selection.set(path, self.selection.state(path) != ALL)
+                # Only the toggled subtree and the folders above it can have changed
+                self.refresh_check_marks([item])
+                self.refresh_ancestor_marks(item)
+
+    def check_mark(self, path):
+        return self.CHECK_MARKS[self.selection.state(path)]
+
+    def refresh_check_marks(self, items):
+        """Repaints the check column of the given rows and the visible rows below them"""
+        stack = list(items)
+        while stack:
+            item = stack.pop()
+            node = self.item_node(item)
+            if node is None:
+                continue  # Placeholder
+            self.treeview.set(item, "Checked", self.check_mark(self.nodes.path(node)))
+            self.tk_calls += 2
+            if not self.nodes.flags[node] & PLACEHOLDER and self.treeview.item(item, "open"):
+                stack.extend(self.treeview.get_children(item))
+                self.tk_calls += 1
+
+    def refresh_ancestor_marks(self, item):
+        """Repaints the check column of the folders above a row"""
+        parent = self.treeview.parent(item)
+        while parent:
+            self.treeview.set(parent, "Checked", self.check_mark(self.nodes.path(self.item_node(parent))))
+            self.tk_calls += 2
+            parent = self.treeview.parent(parent)
+            self.tk_calls += 1
+
+    def on_search_changed(self, *args):
+        """Filters the tree once typing pauses"""
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(self.SEARCH_DELAY_MS, self.apply_search)
+
+    def apply_search(self):
+        """Shows only the items matching the search box, their folders and nothing else"""
+        self.search_job = None
+        self.clear_filter()
+        query = self.search_var.get().strip()
+        if not query or self.search_index is None:
+            self.search_status.config(text="")
+            return
+        
+        matches = self.search_index.search(query)
+        shown = matches[:self.MAX_SHOWN_MATCHES]
+        if len(matches) > len(shown):
+            self.search_status.config(text=f"{len(matches):,} matches, first {len(shown):,} shown")
+        else:
+            self.search_status.config(text=f"{len(matches):,} matches")
+        
+        # Names to keep in every folder on the way to a shown match
+        keep = {}
+        for entry in shown:
+            path = self.search_index.path(entry)
+            while path != self.scan_model.root:
+                parent = os.path.dirname(path)
+                names = keep.setdefault(parent, set())
+                name = os.path.basename(path)
+                if name in names:
+                    break  # Its folders were kept by an earlier match
+                names.add(name)
+                path = parent
+        
+        # Parents are shorter than their subfolders, so they are materialized first
+        for folder in sorted(keep, key=len):
+            node = self.nodes.find(folder)
+            if node is None:
+                continue
+            self.materialize_children(node)
+            item = str(node)
+            if not self.treeview.item(item, "open"):
+                self.treeview.item(item, open=True)
+                self.filter_opened.append(item)
+            names = keep[folder]
+            hidden = []
+            for index, child in enumerate(self.treeview.get_children(item)):
+                child_node = self.item_node(child)
+                if child_node is not None and self.nodes.names[child_node] not in names:
+                    hidden.append(child)
+                    self.filter_detached.append((child, item, index))
+            if hidden:
+                self.treeview.detach(*hidden)
+            self.tk_calls += 3
+        self.refresh_check_marks(self.treeview.get_children())
+
+    def clear_filter(self):
+        """Puts back the items hidden by the search filter"""
+        # Reattached in their original order, so each index is valid again when it is used
+        for item, parent, index in self.filter_detached:
+            # Items deleted meanwhile are gone, and their ids may be reused elsewhere
+            if self.treeview.exists(item) and self.treeview.parent(item) == "":
+                self.treeview.move(item, parent, index)
+                self.tk_calls += 1
+        for item in self.filter_opened:
+            if self.treeview.exists(item):
+                self.treeview.item(item, open=False)
+                self.tk_calls += 1
+        if self.filter_detached or self.filter_opened:
+            self.filter_detached.clear()
+            self.filter_opened.clear()
+            # Hidden rows missed the check mark changes made while they were detached
+            self.refresh_check_marks(self.treeview.get_children())
+
+    def check_all_matches(self):
+        """Checks every item matching the search box, also those beyond the shown ones"""
+        query = self.search_var.get().strip()
+        if not query or self.search_index is None:
+            return
+        for entry in self.search_index.search(query):
+            self.selection.set(self.search_index.path(entry), True)
+        self.refresh_check_marks(self.treeview.get_children())
+
+    def get_checked_items(self):
+        """Returns the full paths of the checked items, straight from the selection model"""
+        if self.selection is None:
+            return []  # Nothing scanned yet
+        return self.selection.checked_paths()
+
+    def generate_structure(self, record_snapshot=True):
+        """Starts generating the formatted directory structure on a background thread.
+
+        Only generations the user asked for record a snapshot; the ones watch mode starts
+        leave the changes-only baseline alone.
+        """
+        profiler = Profiler("generate")
+        with profiler.phase("collect"):
+            checked_paths = self.get_checked_items()
+        profiler.count(items=len(checked_paths))
+        if not checked_paths:
+            messagebox.showwarning("Warning", "No items were selected.")
+            return
+        profiler.cprofile_file = self.cprofile_file("generate")
+        
+        snapshot_file = None
+        since = None
+        if self.engine.data_dir:
+            snapshot_file = snapshot_file_for(self.engine.data_dir, self.selected_directory)
+            if self.changes_only.get():
+                try:
+                    since = Snapshot.load(snapshot_file)
+                except ValueError:
+                    since = None
+                if since is None and record_snapshot:
+                    messagebox.showinfo("Info", "No earlier structure of this folder was found, so everything is included.")
+        
+        self.generate_button.config(state=tk.DISABLED)
+        self.status_frame.pack(after=self.top_frame, fill=tk.X, pady=5)
+        self.cancel_button.pack(pady=(0, 5))
+        self.update_progress(0, "Reading files...")
+        
+        # The preview follows the output as it streams in
+        self.save_button.config(state=tk.DISABLED)
+        self.copy_button.config(state=tk.DISABLED)
+        output = OutputBuffer()
+        self.preview.show(output)
+        self.cancel_event = threading.Event()
+        self.profilers['generate'] = profiler
+        threading.Thread(target=self.build_structure,
+                         args=(self.selected_directory, checked_paths, output, self.cancel_event, profiler,
+                               since, snapshot_file if record_snapshot else None), daemon=True).start()
+        self.root.after(self.FRAME_MS, self.process_generate_queue)
+
+    def cancel_generation(self):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.status_label.config(text="Cancelling...")
+
+    def build_structure(self, directory, checked_paths, output, cancel_event, profiler, since=None, snapshot_file=None):
+        """Streams the structure into output off the Tk thread, telling the preview about new lines through generate_queue."""
+        last_update = [time.perf_counter()]
+        cache = self.engine.content_cache
+        start_hits, start_misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+        def on_progress(done, total):
+            now = time.perf_counter()
+            if now - last_update[0] >= self.FRAME_INTERVAL:
+                status = f"Read {done} of {total} items"
+                if cache is not None:
+                    status += f" (cache: {cache.hits - start_hits} hits, {cache.misses - start_misses} misses)"
+                self.generate_queue.put(('progress', (done / total * 100, status)))
+                last_update[0] = now
+        
+        unseen = [0]
+        def write(text):
+            output.write(text)
+            unseen[0] += len(text)
+            if unseen[0] >= self.PREVIEW_CHUNK:
+                self.generate_queue.put(('lines', None))
+                unseen[0] = 0
+        
+        record = Snapshot(directory) if snapshot_file else None
+        try:
+            with profiler.capture():
+                completed = self.engine.generate(directory, checked_paths, write, cancel_event, on_progress, profiler,
+                                                 output.mark_file, since, record)
+        except Exception as e:
+            # A snapshot of another root, a locked cache, a full disk... the UI must still be given back
+            self.generate_queue.put(('error', (output, str(e))))
+            return
+        if completed and record is not None:
+            try:
+                record.save(snapshot_file)
+            except OSError:
+                pass  # The next changes-only run then includes everything
+        self.generate_queue.put(('done' if completed else 'cancelled', output))
+
+    def process_generate_queue(self):
+        """Applies generation messages on the Tk thread, spending at most APPLY_BUDGET per frame"""
+        deadline = time.perf_counter() + self.APPLY_BUDGET
+        progress = None
+        while time.perf_counter() < deadline:
+            try:
+                msg_type, data = self.generate_queue.get_nowait()
+            except Empty:
+                break
+            
+            if msg_type == 'progress':
+                progress = data
+            elif msg_type == 'lines':
+                with self.tk_phase(self.profilers['generate'], "preview"):
+                    self.preview.refresh()
+            elif msg_type == 'exported':
+                file_path, profiler, error = data
+                self.profilers['export'] = profiler
+                self.save_button.config(state=tk.NORMAL)
+                self.generate_button.config(state=tk.NORMAL)
+                if error:
+                    self.status_frame.pack_forget()
+                    messagebox.showerror("Error", f"Could not export to {file_path}: {error}")
+                else:
+                    self.show_summary(profiler)
+                    messagebox.showinfo("Success", f"Structure exported to: {file_path}")
+                return
+            elif msg_type in ('done', 'cancelled'):
+                self.cancel_event = None
+                self.cancel_button.pack_forget()
+                self.generate_button.config(state=tk.NORMAL)
+                if msg_type == 'done':
+                    self.show_summary(self.profilers['generate'])
+                    if self.output_file is not None:
+                        self.output_file.close()
+                    self.output_file = data
+                    self.preview.refresh()
+                    self.preview.update_files()
+                    self.save_button.config(state=tk.NORMAL)
+                    self.copy_button.config(state=tk.NORMAL)
+                else:
+                    self.status_frame.pack_forget()
+                    data.close()
+                    self.restore_output()
+                return
+            elif msg_type == 'error':
+                output, error = data
+                self.cancel_event = None
+                self.cancel_button.pack_forget()
+                self.generate_button.config(state=tk.NORMAL)
+                self.status_frame.pack_forget()
+                output.close()
+                self.restore_output()
+                messagebox.showerror("Error", f"Could not generate the structure: {error}")
+                return
+        
+        if progress is not None:
+            self.update_progress(*progress)
+        self.root.after(self.FRAME_MS, self.process_generate_queue)
+
+    def restore_output(self):
+        """Shows the last complete output again after a run that didn't finish"""
+        if self.output_file is None:
+            self.clear_preview()
+            return
+        self.preview.show(self.output_file)
+        self.preview.update_files()
+        self.save_button.config(state=tk.NORMAL)
+        self.copy_button.config(state=tk.NORMAL)
+
+    @contextmanager
+    def tk_phase(self, profiler, name):
+        """Records a phase run on the Tk thread along with the Tk calls it made"""
+        calls = self.tk_calls
+        with profiler.phase(name):
+            yield
+        profiler.count(tk_calls=self.tk_calls - calls)
+
+    def show_summary(self, profiler):
+        """Leaves the status bar showing where the time of a finished run went"""
+        text = f"{profiler.name.capitalize()} finished: {profiler.summary()}"
+        if profiler.cprofile_file:
+            text += f" (cProfile stats saved to {profiler.cprofile_file})"
+        self.update_progress(100, text)
+
+    def cprofile_file(self, name):
+        """Returns where to save cProfile stats if profiling of the next run was requested, clearing the request"""
+        if not self.settings.get('profile_next_run') or not self.engine.data_dir:
+            return None
+        self.settings['profile_next_run'] = False
+        self.save_settings()
+        return os.path.join(self.engine.data_dir, f"{name}.prof")
+
+    def export_trace(self):
+        if not self.profilers:
+            messagebox.showwarning("Warning", "Scan a directory first.")
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Chrome Trace", "*.json")])
+        if file_path:
+            Profiler.export(file_path, self.profilers.values())
+            messagebox.showinfo("Success", f"Trace saved to: {file_path}\nOpen it in chrome://tracing or ui.perfetto.dev")
+
+    def count_preview_render(self):
+        # Delete, insert, two state changes and the scrollbar
+        self.tk_calls += 5
+
+    def clear_preview(self):
+        self.preview.clear()
+
+    def save_structure(self):
+        if self.output_file is None:
+            messagebox.showerror("Error", "No structure generated to save.")
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".txt", filetypes=self.EXPORT_FILETYPES)
+        if not file_path:
+            return
+        export_format, compressed = format_for(file_path)
+        if export_format == 'text':
+            # Copied from the generated output file, never rebuilt as one string
+            try:
+                with open_output(file_path, compressed) as file:
+                    self.output_file.write_to(file.write)
+            except OSError as e:
+                messagebox.showerror("Error", f"Could not save to {file_path}: {e}")
+                return
+            messagebox.showinfo("Success", f"Structure saved to: {file_path}")
+            return
+        
+        # Structured formats are streamed from the scan model on a worker thread
+        self.save_button.config(state=tk.DISABLED)
+        self.generate_button.config(state=tk.DISABLED)
+        self.status_frame.pack(after=self.top_frame, fill=tk.X, pady=5)
+        self.update_progress(0, "Exporting...")
+        profiler = Profiler("export")
+        threading.Thread(target=self.export_structure, daemon=True,
+                         args=(file_path, export_format, compressed, self.get_checked_items(), profiler)).start()
+        self.root.after(self.FRAME_MS, self.process_generate_queue)
+
+    def export_structure(self, file_path, export_format, compressed, checked_paths, profiler):
+        last_update = [time.perf_counter()]
+        def on_progress(done, total):
+            now = time.perf_counter()
+            if now - last_update[0] >= self.FRAME_INTERVAL:
+                self.generate_queue.put(('progress', (done / total * 100, f"Exported {done} of {total} items")))
+                last_update[0] = now
+        try:
+            with open_output(file_path, compressed) as file:
+                self.engine.export(self.scan_model, checked_paths, file.write, export_format,
+                                   on_progress=on_progress, profiler=profiler)
+        except Exception as e:
+            self.generate_queue.put(('exported', (file_path, profiler, str(e))))
+        else:
+            self.generate_queue.put(('exported', (file_path, profiler, None)))
+
+    def copy_text(self):
+        """Copy the generated structure to the clipboard, straight from the output file."""
+        if self.output_file is not None and self.output_file.size:
+            self.root.clipboard_clear()  # Clear the clipboard
+            # Appended a block at a time, the clipboard joins them
+            self.output_file.write_to(self.root.clipboard_append)
+            messagebox.showinfo("Success", "Text copied to clipboard!")
+        else:
+            messagebox.showwarning("Warning", "No text to copy!")
+
+def run():
+    root = tk.Tk()
+    app = DirectoryStructureApp(root)
+    root.mainloop()
\ No newline at end of file
@@ -0,0 +1,147 @@
+import os
+import re
+
+# Read in this order in every folder, so .ignore overrides .gitignore
+IGNORE_FILES = (".gitignore", ".ignore")
+GLOB_CHARS = frozenset("*?[\\")
+
+
+class IgnoreRule:
+    """One line of a .gitignore file, compiled to a regular expression.
+
+    Patterns without a slash match the name at any depth below the folder they come from;
+    patterns with one are anchored to that folder and match the path relative to it.
+    """
+    def __init__(self, pattern):
+        self.negate = pattern.startswith("!")
+        if self.negate:
+            pattern = pattern[1:]
+        elif pattern.startswith("\\!") or pattern.startswith("\\#"):
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        self.anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+        self.pattern = pattern
+        self.literal = None if GLOB_CHARS & set(pattern) else pattern
+        self.regex = re.compile(translate(pattern))
+        # Anchored patterns without ** only match at one depth, deeper folders can drop them
+        self.depth = None if "**" in pattern else pattern.count("/") + 1
+
+    @staticmethod
+    def parse(lines):
+        rules = []
+        for line in lines:
+            line = line.rstrip("\n\r")
+            if not line.endswith("\\ "):
+                line = line.rstrip()
+            if line and not line.startswith("#") and line != "!":
+                rules.append(IgnoreRule(line))
+        return rules
+
+
+def translate(pattern):
+    """Translates a gitignore glob into a regular expression for re.fullmatch"""
+    parts = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i) and (i == 0 or pattern[i - 1] == "/"):
+            parts.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i) and i + 2 == n and (i == 0 or pattern[i - 1] == "/"):
+            parts.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            parts.append("[^/]*")
+        elif c == "?":
+            parts.append("[^/]")
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            parts.append(re.escape(pattern[i]))
+        elif c == "[":
+            end = pattern.find("]", i + 2 if pattern.startswith("[!", i) or pattern.startswith("[^", i) else i + 1)
+            if end == -1:
+                parts.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    return "".join(parts)
+
+
+class IgnoreLevel:
+    """The ignore rules that apply to the entries of one folder.
+
+    Each rule is kept with the path from its own folder down to this one, so anchored
+    patterns are matched against relative paths. Consecutive rules with the same outcome
+    are merged into a name set and a single regular expression when first used.
+    """
+    def __init__(self, rules):
+        self.rules = rules  # [(IgnoreRule, prefix)], in file order
+        self._groups = None
+
+    @classmethod
+    def from_patterns(cls, patterns):
+        return cls([(rule, "") for rule in IgnoreRule.parse(patterns)])
+
+    def enter(self, name):
+        """Returns the level for the subfolder name, before its own ignore files are added"""
+        if not any(rule.anchored for rule, _ in self.rules):
+            return self  # Shared, unanchored rules match the same way at every depth
+        rules = []
+        for rule, prefix in self.rules:
+            if rule.anchored:
+                prefix = prefix + name + "/"
+                if rule.depth is not None and prefix.count("/") >= rule.depth:
+                    continue
+            rules.append((rule, prefix))
+        return IgnoreLevel(rules)
+
+    def extend(self, path, names):
+        """Adds the rules of the ignore files of path among names"""
+        rules = None
+        for file_name in IGNORE_FILES:
+            if file_name in names:
+                try:
+                    with open(os.path.join(path, file_name), encoding="utf-8", errors="replace") as f:
+                        parsed = IgnoreRule.parse(f)
+                except OSError:
+                    continue
+                rules = (rules or list(self.rules)) + [(rule, "") for rule in parsed]
+        return self if rules is None else IgnoreLevel(rules)
+
+    @property
+    def groups(self):
+        if self._groups is None:
+            groups = []
+            for rule, prefix in self.rules:
+                key = (rule.negate, rule.dir_only, prefix if rule.anchored else None)
+                if groups and groups[-1][0] == key:
+                    groups[-1][1].append(rule)
+                else:
+                    groups.append((key, [rule]))
+            self._groups = []
+            for (negate, dir_only, prefix), rules in reversed(groups):
+                names = frozenset(rule.literal for rule in rules if rule.literal is not None)
+                patterns = [rule.regex.pattern for rule in rules if rule.literal is None]
+                regex = re.compile("|".join(f"(?:{pattern})" for pattern in patterns)) if patterns else None
+                self._groups.append((negate, dir_only, prefix, names, regex))
+        return self._groups
+
+    def ignored(self, name, is_dir):
+        """Returns True if the entry name of this folder is ignored; the last matching rule wins"""
+        for negate, dir_only, prefix, names, regex in self.groups:
+            if dir_only and not is_dir:
+                continue
+            subject = name if prefix is None else prefix + name
+            if subject in names or (regex is not None and regex.fullmatch(subject)):
+                return not negate
+        return False
@@ -0,0 +1,118 @@
+import os
+import sys
+from array import array
+
+# Node flags
+DIR = 1
+PLACEHOLDER = 2  # Folder item still showing a dummy child in the Treeview
+OMITTED = 4  # File left out of the generated contents by the output budget
+# Changes since a snapshot
+ADDED = 8
+MODIFIED = 16
+DELETED = 32
+
+
+class NodeTable:
+    """Tree nodes kept in parallel arrays, with full paths rebuilt on demand.
+
+    Node n has parents[n] (-1 for the root, which is node 0 and named by its full path),
+    names[n] and flags[n]; folders map the names of their children to nodes. Names are
+    interned, so they are shared with the scan listings instead of copied.
+
+    Per node on 64-bit CPython: 4 bytes of parent index, an 8-byte name pointer, 1 byte of
+    flags, about 35 bytes for its entry in the parent's children dict and a 28-byte int for
+    its id there (only ids up to 256 are shared), roughly 75 bytes against about 250 for a
+    full path string held in two path dicts. Each folder adds an empty dict (~64 bytes) once
+    it has children.
+
+    Only the Treeview items are kept here. ScanModel.listings, SelectionModel.total/checked
+    and SearchIndex.folders are still keyed by folder path, one string per folder rather
+    than per item, and are out of scope.
+    """
+    def __init__(self, root):
+        self.root = root
+        self.parents = array('i')
+        self.names = []
+        self.flags = bytearray()
+        self.children = {}  # folder node -> {name: child node}, in insertion order
+        self.free = []  # Removed nodes, reused by add
+        self.add(-1, root, True)
+
+    def add(self, parent, name, is_dir):
+        name = sys.intern(name)
+        if self.free:
+            node = self.free.pop()
+            self.parents[node] = parent
+            self.names[node] = name
+            self.flags[node] = DIR if is_dir else 0
+        else:
+            node = len(self.names)
+            self.parents.append(parent)
+            self.names.append(name)
+            self.flags.append(DIR if is_dir else 0)
+        if parent >= 0:
+            self.children.setdefault(parent, {})[name] = node
+        return node
+
+    def remove(self, node):
+        """Removes a node and everything below it"""
+        parent = self.parents[node]
+        if parent >= 0:
+            self.children[parent].pop(self.names[node], None)
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            stack.extend(self.children.pop(current, {}).values())
+            self.names[current] = None
+            self.flags[current] = 0
+            self.free.append(current)
+
+    def is_dir(self, node):
+        return bool(self.flags[node] & DIR)
+
+    def child(self, node, name):
+        return self.children.get(node, {}).get(name)
+
+    def child_nodes(self, node):
+        return list(self.children.get(node, {}).values())
+
+    def path(self, node):
+        """The full path of a node"""
+        parts = []
+        while node > 0:
+            parts.append(self.names[node])
+            node = self.parents[node]
+        return os.path.join(self.root, *reversed(parts))
+
+    def rel_path(self, node):
+        """The path of a node relative to the root, "" for the root"""
+        parts = []
+        while node > 0:
+            parts.append(self.names[node])
+            node = self.parents[node]
+        return os.path.join(*reversed(parts)) if parts else ""
+
+    def find(self, path):
+        """Returns the node of a full path, or None if it isn't in the table"""
+        if path == self.root:
+            return 0
+        prefix = os.path.join(self.root, "")
+        if not path.startswith(prefix):
+            return None
+        node = 0
+        for name in path[len(prefix):].split(os.sep):
+            node = self.child(node, name)
+            if node is None:
+                return None
+        return node
+
+    def add_path(self, path, is_dir=True):
+        """Returns the node of a full path below the root, adding it and its missing parents"""
+        node = 0
+        parts = os.path.relpath(path, self.root).split(os.sep)
+        for i, name in enumerate(parts):
+            child = self.child(node, name)
+            if child is None:
+                child = self.add(node, name, is_dir or i < len(parts) - 1)
+            node = child
+        return node
@@ -0,0 +1,214 @@
+import tempfile
+import threading
+import re
+import codecs
+from array import array
+import tkinter as tk
+from tkinter import ttk
+import tkinter.font as tkfont
+
+NEWLINE = re.compile(b"\n")
+
+
+class OutputBuffer:
+    """Generated output kept in a temporary file, with the byte offset of every line.
+
+    The generation thread only appends and counts newlines; the offsets are found by the Tk
+    thread a block at a time, as far as the preview has been scrolled, and the lock keeps the
+    seeks of both threads apart. Nothing but the lines asked for is ever held in memory, so
+    outputs of any size can be previewed, copied and saved.
+    """
+    # Bytes read at a time when lines are indexed or the whole output is streamed out
+    INDEX_BLOCK = 1024 * 1024
+    COPY_BLOCK = 1024 * 1024
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.lock = threading.Lock()
+        self.size = 0
+        self.newlines = 0
+        self.files = []  # (line, relative path) where the contents of each file start
+        # Byte offset of each line start found so far, and how far the file was searched for them
+        self.starts = array('q', [0])
+        self.indexed = 0
+        self.last_byte = b""
+
+    def write(self, text):
+        data = text.encode("utf-8")
+        with self.lock:
+            self.file.write(data)
+            self.size += len(data)
+            self.newlines += data.count(b"\n")
+            self.last_byte = data[-1:] or self.last_byte
+
+    def mark_file(self, rel_path):
+        """Records that the contents of rel_path start on the line being written"""
+        self.files.append((self.newlines, rel_path))
+
+    def line_count(self):
+        with self.lock:
+            return self.newlines + (1 if self.size and self.last_byte != b"\n" else 0)
+
+    def index_to(self, line):
+        """Finds line starts until the end of line is known or the written data runs out"""
+        while len(self.starts) <= line + 1 and self.indexed < self.size:
+            with self.lock:
+                self.file.flush()
+                self.file.seek(self.indexed)
+                block = self.file.read(self.INDEX_BLOCK)
+                self.file.seek(0, 2)
+            base = self.indexed
+            self.starts.extend(base + match.end() for match in NEWLINE.finditer(block))
+            self.indexed += len(block)
+
+    def read_lines(self, first, count):
+        """Returns up to count lines starting at line first, without their newlines"""
+        self.index_to(first + count)
+        with self.lock:
+            first = min(first, len(self.starts) - 1)
+            last = first + count
+            start = self.starts[first]
+            end = self.starts[last] if last < len(self.starts) else self.size
+            self.file.flush()
+            self.file.seek(start)
+            data = self.file.read(end - start)
+            self.file.seek(0, 2)
+        if not data:
+            return []
+        lines = data.decode("utf-8", errors="replace").split("\n")
+        return (lines[:-1] if data.endswith(b"\n") else lines)[:count]
+
+    def write_to(self, write):
+        """Streams the whole output as text to write(), a block at a time"""
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        position = 0
+        while True:
+            with self.lock:
+                self.file.flush()
+                self.file.seek(position)
+                data = self.file.read(self.COPY_BLOCK)
+                self.file.seek(0, 2)
+            position += len(data)
+            text = decoder.decode(data, final=not data)
+            if text:
+                write(text)
+            if not data:
+                return
+
+    def close(self):
+        self.file.close()
+
+
+class PreviewPane(tk.Frame):
+    """Read-only view of an OutputBuffer that only ever holds the lines on screen.
+
+    The scrollbar, mouse wheel and keys move a window of lines over the buffer and the text
+    widget is refilled with just that window, so Tk never lays out more than a screenful
+    however large the output is. "Jump to file" scrolls to the contents of a file.
+    """
+    # Characters of a line shown; minified files can have lines of megabytes
+    MAX_LINE_CHARS = 4000
+
+    def __init__(self, parent, height=15):
+        super().__init__(parent)
+        self.buffer = None
+        self.top = 0  # First line shown
+        self.shown = 0  # Lines currently in the text widget
+        self.on_render = None  # Called after each refill of the text widget
+
+        self.jump_frame = tk.Frame(self)
+        self.jump_frame.pack(fill=tk.X)
+        tk.Label(self.jump_frame, text="Jump to file:").pack(side=tk.LEFT)
+        self.jump_var = tk.StringVar()
+        self.jump_box = ttk.Combobox(self.jump_frame, textvariable=self.jump_var, state="readonly")
+        self.jump_box.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.jump_box.bind("<<ComboboxSelected>>", self.on_jump)
+
+        self.text = tk.Text(self, wrap=tk.NONE, state=tk.DISABLED, height=height)
+        self.linespace = tkfont.Font(font=self.text.cget("font")).metrics("linespace")
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.text.bind("<Configure>", lambda e: self.render())
+        self.text.bind("<MouseWheel>", lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        self.text.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.text.bind("<Button-5>", lambda e: self.scroll(3))
+        for key, lines in (("<Up>", -1), ("<Down>", 1)):
+            self.text.bind(key, lambda e, lines=lines: self.scroll(lines) or "break")
+        self.text.bind("<Prior>", lambda e: self.scroll(-self.visible_lines()) or "break")
+        self.text.bind("<Next>", lambda e: self.scroll(self.visible_lines()) or "break")
+        self.text.bind("<Control-Home>", lambda e: self.scroll_to(0) or "break")
+        self.text.bind("<Control-End>", lambda e: self.scroll_to(self.buffer.line_count() if self.buffer else 0) or "break")
+
+    def show(self, buffer):
+        self.buffer = buffer
+        self.top = 0
+        self.jump_box.config(values=())
+        self.jump_var.set("")
+        self.render()
+
+    def clear(self):
+        self.show(None)
+
+    def refresh(self):
+        """Shows lines added to the buffer, refilling the text widget only if they are on screen"""
+        if self.buffer is None:
+            return
+        if self.shown < self.visible_lines():
+            self.render()
+        else:
+            self.update_scrollbar()
+
+    def update_files(self):
+        """Fills the jump list with the files whose contents are in the buffer"""
+        if self.buffer is not None:
+            self.jump_box.config(values=[rel_path for _, rel_path in self.buffer.files])
+
+    def on_jump(self, event):
+        index = self.jump_box.current()
+        if self.buffer is not None and index >= 0:
+            self.scroll_to(self.buffer.files[index][0])
+
+    def visible_lines(self):
+        height = self.text.winfo_height()
+        return max(height // self.linespace, 1) if height > 1 else int(self.text.cget("height"))
+
+    def scroll(self, lines):
+        self.scroll_to(self.top + lines)
+
+    def scroll_to(self, line):
+        total = self.buffer.line_count() if self.buffer is not None else 0
+        self.top = max(0, min(line, total - self.visible_lines()))
+        self.render()
+
+    def on_scroll(self, action, amount, unit=None):
+        """Scrollbar command: ("moveto", fraction) or ("scroll", n, "units" or "pages")"""
+        if action == "moveto":
+            total = self.buffer.line_count() if self.buffer is not None else 0
+            self.scroll_to(int(float(amount) * total))
+        elif unit == "pages":
+            self.scroll(int(amount) * self.visible_lines())
+        else:
+            self.scroll(int(amount))
+
+    def render(self):
+        lines = []
+        if self.buffer is not None:
+            lines = self.buffer.read_lines(self.top, self.visible_lines())
+        self.shown = len(lines)
+        self.text.config(state=tk.NORMAL)
+        self.text.delete("1.0", tk.END)
+        self.text.insert("1.0", "\n".join(
+            line if len(line) <= self.MAX_LINE_CHARS else line[:self.MAX_LINE_CHARS] + "…" for line in lines))
+        self.text.config(state=tk.DISABLED)
+        self.update_scrollbar()
+        if self.on_render is not None:
+            self.on_render()
+
+    def update_scrollbar(self):
+        total = self.buffer.line_count() if self.buffer is not None else 0
+        if total:
+            self.scrollbar.set(self.top / total, min(self.top + self.shown, total) / total)
+        else:
+            self.scrollbar.set(0, 1)
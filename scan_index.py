@@ -0,0 +1,79 @@
+import os
+import time
+import threading
+
+from sqlite_store import RACY_WINDOW_NS, SQLiteStore
+
+
+class ScanIndex:
+    """Folder listings and mtimes of one scanned root, persisted in SQLite.
+
+    A folder's mtime changes whenever an entry is added, removed or renamed in it, so a
+    folder whose mtime matches the stored one can reuse its listing without os.scandir.
+    Scans of other roots (another window, the command line) can write to the same database;
+    if it can't be written, the listings found so far are still used but no longer stored.
+    """
+    SEPARATOR = "\0"
+
+    def __init__(self, index_file, root):
+        """Opens the index; raises sqlite3.DatabaseError if the database can't be used"""
+        self.root = root
+        # Shared by the workers of a parallel scan
+        self.lock = threading.Lock()
+        self.store = SQLiteStore(index_file, [
+            "CREATE TABLE IF NOT EXISTS directories ("
+            "root TEXT NOT NULL, path TEXT NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "dirs TEXT NOT NULL, files TEXT NOT NULL, PRIMARY KEY (root, path))"])
+        # Loaded with a single query, a lookup per folder would cost more than listing it
+        self.stored = {
+            path: (mtime_ns, dirs, files) for path, mtime_ns, dirs, files in self.store.query(
+                "SELECT path, mtime_ns, dirs, files FROM directories WHERE root = ?", (root,))}
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self.lock:
+            self.store.close()
+
+    def split(self, names):
+        return names.split(self.SEPARATOR) if names else []
+
+    def get(self, path, mtime_ns):
+        """Returns the stored (dirs, files) of a folder if its mtime is unchanged, else None"""
+        row = self.stored.get(path)
+        with self.lock:
+            if row is not None and row[0] == mtime_ns:
+                self.hits += 1
+            else:
+                self.misses += 1
+                return None
+        return self.split(row[1]), self.split(row[2])
+
+    def put(self, path, mtime_ns, dirs, files):
+        """Stores a fresh listing, dropping the entries of subfolders that no longer exist"""
+        if time.time_ns() - mtime_ns < RACY_WINDOW_NS:
+            mtime_ns = -1  # Never trusted, listed again on the next scan
+        row = self.stored.get(path)
+        with self.lock:
+            if row is not None:
+                for name in set(self.split(row[1])) - set(dirs):
+                    self.delete_tree(os.path.join(path, name))
+            self.store.write(
+                "INSERT OR REPLACE INTO directories VALUES (?, ?, ?, ?, ?)",
+                (self.root, path, mtime_ns, self.SEPARATOR.join(dirs), self.SEPARATOR.join(files)))
+
+    def remove_tree(self, path):
+        with self.lock:
+            self.delete_tree(path)
+
+    def delete_tree(self, path):
+        prefix = path + os.sep
+        self.store.write(
+            "DELETE FROM directories WHERE root = ? AND (path = ? OR substr(path, 1, ?) = ?)",
+            (self.root, path, len(prefix), prefix))
@@ -0,0 +1,135 @@
+import os
+import sys
+from array import array
+from itertools import chain
+
+
+class SearchIndex:
+    """Case-insensitive substring search over the names of the scanned files and folders.
+
+    Each trigram of a lowercase name maps to an array of entry ids; a query only checks the
+    names in the shortest array among its own trigrams, and a query that extends the previous
+    one only rechecks the previous matches. Listings are added and removed as the scan and the
+    watcher report them, so nothing is rebuilt while the user types. Removed entries stay in
+    the arrays, where the name check skips them, until enough pile up for compact().
+    """
+    # Removed entries tolerated before the index is compacted
+    MIN_COMPACT = 1024
+
+    def __init__(self, root):
+        self.root = root
+        self.parents = array('i')  # entry -> entry of its folder, -1 for items of the root
+        self.dirs = bytearray()  # entry -> 1 for a folder
+        self.names = []  # entry -> name, None once removed
+        self.folded = []  # entry -> lowercase name, shared with names when equal
+        self.folders = {root: {}}  # folder path -> {name: entry}
+        self.trigrams = {}
+        self.live = 0
+        self.last_query = None
+        self.last_matches = None
+
+    def __len__(self):
+        return self.live
+
+    def entry(self, path):
+        """The entry of an indexed folder, -1 for the root and None if it isn't indexed"""
+        if path == self.root:
+            return -1
+        return self.folders.get(os.path.dirname(path), {}).get(os.path.basename(path))
+
+    def path(self, entry):
+        parts = []
+        while entry >= 0:
+            parts.append(self.names[entry])
+            entry = self.parents[entry]
+        return os.path.join(self.root, *reversed(parts))
+
+    def update_listing(self, path, dirs, files):
+        """Indexes the new children of a folder and drops the ones that are gone"""
+        folder = self.entry(path)
+        if folder is None:
+            return  # Below a folder that isn't indexed
+        children = self.folders.setdefault(path, {})
+        kinds = dict.fromkeys(files, 0)
+        kinds.update(dict.fromkeys(dirs, 1))
+        # A folder replaced by a file of the same name (or the reverse) is dropped and added again
+        for name in [name for name, entry in children.items() if kinds.get(name) != self.dirs[entry]]:
+            self.remove_tree(os.path.join(path, name))
+        folder = self.entry(path)  # Renumbered if the removals compacted the index
+        for name in chain(files, dirs):
+            if name not in children:
+                children[name] = self.add(folder, name, kinds[name])
+        self.last_query = None
+
+    def add(self, folder, name, is_dir):
+        entry = len(self.names)
+        name = sys.intern(name)
+        folded = name.lower()
+        self.parents.append(folder)
+        self.dirs.append(is_dir)
+        self.names.append(name)
+        self.folded.append(name if folded == name else folded)
+        self.live += 1
+        self.index(entry, folded)
+        return entry
+
+    def index(self, entry, folded):
+        trigrams = self.trigrams
+        for gram in {folded[i:i + 3] for i in range(len(folded) - 2)}:
+            entries = trigrams.get(gram)
+            if entries is None:
+                entries = trigrams[gram] = array('i')
+            entries.append(entry)
+
+    def remove_tree(self, path):
+        """Drops an item and, for a folder, everything below it"""
+        entry = self.folders.get(os.path.dirname(path), {}).pop(os.path.basename(path), None)
+        if entry is None:
+            return
+        stack = [(path, entry)]
+        while stack:
+            current, entry = stack.pop()
+            self.names[entry] = self.folded[entry] = None
+            self.live -= 1
+            children = self.folders.pop(current, {})
+            stack.extend((os.path.join(current, name), child) for name, child in children.items())
+        self.last_query = None
+        if len(self.names) - self.live > max(self.live, self.MIN_COMPACT):
+            self.compact()
+
+    def compact(self):
+        """Drops the removed entries and renumbers the rest; folders come before their items"""
+        new_ids = {}
+        parents, dirs, names, folded = array('i'), bytearray(), [], []
+        for entry, name in enumerate(self.names):
+            if name is not None:
+                new_ids[entry] = len(names)
+                parent = self.parents[entry]
+                parents.append(new_ids[parent] if parent >= 0 else -1)
+                dirs.append(self.dirs[entry])
+                names.append(name)
+                folded.append(self.folded[entry])
+        self.parents, self.dirs, self.names, self.folded = parents, dirs, names, folded
+        for children in self.folders.values():
+            for name, entry in children.items():
+                children[name] = new_ids[entry]
+        self.trigrams = {}
+        for entry, name in enumerate(folded):
+            self.index(entry, name)
+        self.last_query = None
+
+    def search(self, query):
+        """Returns the entries whose name contains query, in scan order"""
+        query = query.lower()
+        if not query:
+            return []
+        if self.last_query is not None and query.startswith(self.last_query):
+            candidates = self.last_matches  # Typing on, only the previous matches can still match
+        elif len(query) < 3:
+            candidates = range(len(self.folded))
+        else:
+            candidates = min((self.trigrams.get(query[i:i + 3], ()) for i in range(len(query) - 2)), key=len)
+        folded = self.folded
+        matches = [entry for entry in candidates if folded[entry] is not None and query in folded[entry]]
+        self.last_query, self.last_matches = query, matches
+        return matches
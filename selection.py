@@ -0,0 +1,157 @@
+import os
+
+NONE, PARTIAL, ALL = 0, 1, 2
+
+
+class SelectionModel:
+    """Tri-state check marks over a ScanModel, kept as per-folder counters.
+
+    Every leaf (a file, or a folder without children) counts once in the totals of its
+    ancestors, and each folder tracks how many of its leaves are checked. Checking a folder
+    records a flag on it instead of visiting its subtree; the flag is pushed down one level
+    at a time when something inside the folder changes, so a toggle costs O(depth).
+    """
+    def __init__(self, model):
+        self.model = model
+        self.total = {model.root: 1}  # folder -> number of leaves below it
+        self.checked = {model.root: 0}  # folder -> number of checked leaves below it
+        self.flags = {}  # folder -> True/False applying to its whole subtree
+        self.checked_files = set()
+
+    def ancestors(self, path):
+        """Yields the folders above path, nearest first"""
+        while path != self.model.root:
+            path = os.path.dirname(path)
+            yield path
+
+    def inherited_flag(self, path):
+        """Returns the flag of the topmost flagged ancestor, which overrides the stored values"""
+        flag = None
+        for ancestor in self.ancestors(path):
+            flag = self.flags.get(ancestor, flag)
+        return flag
+
+    def state(self, path):
+        flag = self.inherited_flag(path)
+        if flag is not None:
+            return ALL if flag else NONE
+        if path in self.total:
+            checked = self.checked[path]
+            return NONE if checked == 0 else ALL if checked == self.total[path] else PARTIAL
+        return ALL if path in self.checked_files else NONE
+
+    def push_down(self, path):
+        """Applies the flags of path and its ancestors to their children, top-down"""
+        chain = [path, *self.ancestors(path)]
+        for folder in reversed(chain):
+            flag = self.flags.pop(folder, None)
+            if flag is not None:
+                for _, child, is_dir in self.model.children(folder):
+                    self.apply_flag(child, is_dir, flag)
+
+    def apply_flag(self, path, is_dir, flag):
+        if is_dir:
+            self.checked[path] = self.total[path] if flag else 0
+            self.flags[path] = flag
+        elif flag:
+            self.checked_files.add(path)
+        else:
+            self.checked_files.discard(path)
+
+    def set(self, path, value):
+        """Checks or unchecks an item and everything below it"""
+        if path != self.model.root:
+            self.push_down(os.path.dirname(path))
+        if path in self.total:
+            before = self.checked[path]
+            self.apply_flag(path, True, value)
+            delta = self.checked[path] - before
+        else:
+            before = path in self.checked_files
+            self.apply_flag(path, False, value)
+            delta = value - before
+        for ancestor in self.ancestors(path):
+            self.checked[ancestor] += delta
+
+    def update_listing(self, path, old_children):
+        """Updates the counters after the listing of a folder was added or changed in the scan model.
+
+        old_children is the previous ScanModel.children(path), or None for a first listing.
+        New children start checked only when the folder was fully checked.
+        """
+        if path not in self.total:
+            return
+        if path != self.model.root:
+            self.push_down(os.path.dirname(path))
+        flag = self.flags.pop(path, None)
+        total_before, checked_before = self.total[path], self.checked[path]
+        full = flag if flag is not None else checked_before == total_before
+
+        # A folder replaced by a file of the same name (or the reverse) is a removal and an addition
+        new_children = self.model.children(path)
+        new_items = {(child, is_dir) for _, child, is_dir in new_children}
+        old_items = set()
+        for _, child, is_dir in old_children or ():
+            old_items.add((child, is_dir))
+            if (child, is_dir) not in new_items:
+                self.forget(child, is_dir)
+            elif flag is not None:
+                self.apply_flag(child, is_dir, flag)
+
+        total = checked = 0
+        for _, child, is_dir in new_children:
+            if is_dir:
+                if (child, is_dir) not in old_items:
+                    # Not listed yet, counts as a single leaf
+                    self.total[child] = 1
+                    self.checked[child] = 1 if full else 0
+                total += self.total[child]
+                checked += self.checked[child]
+            else:
+                if (child, is_dir) not in old_items and full:
+                    self.checked_files.add(child)
+                total += 1
+                checked += child in self.checked_files
+        if not new_children:
+            # An empty folder is a leaf itself
+            total, checked = 1, 1 if full else 0
+
+        self.total[path], self.checked[path] = total, checked
+        for ancestor in self.ancestors(path):
+            self.total[ancestor] += total - total_before
+            self.checked[ancestor] += checked - checked_before
+
+    def forget(self, path, is_dir):
+        """Drops an item that disappeared; its subtree must still be in the scan model"""
+        self.checked_files.discard(path)
+        if is_dir:
+            for descendant in [path, *self.model.walk(path)]:
+                self.checked_files.discard(descendant)
+                self.total.pop(descendant, None)
+                self.checked.pop(descendant, None)
+                self.flags.pop(descendant, None)
+
+    def checked_paths(self):
+        """Returns every checked or partially checked path in tree order, the root included"""
+        root = self.model.root
+        if self.checked[root] == 0:
+            return []
+        paths = [root]
+        stack = [(iter(self.model.children(root)), self.flags.get(root))]
+        while stack:
+            children, flag = stack[-1]
+            for _, child, is_dir in children:
+                if flag is not None:
+                    if flag:
+                        paths.append(child)
+                        paths.extend(self.model.walk(child))
+                elif is_dir:
+                    if self.checked[child]:
+                        paths.append(child)
+                        stack.append((iter(self.model.children(child)), self.flags.get(child)))
+                        break
+                elif child in self.checked_files:
+                    paths.append(child)
+            else:
+                stack.pop()
+        return paths
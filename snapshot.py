@@ -0,0 +1,55 @@
+"""Snapshot manifests: what a generated output contained, to send only the changes next time.
+
+A manifest is a JSON file:
+{"version": 1, "root": "/abs/root", "created": 1700000000.0,
+ "files": {"src/app.py": [size, mtime_ns, "blake2b hex digest or null"], ...}}
+with paths relative to the root and "/" separators. The digest is that of the decoded text and
+is null for files whose contents weren't read (binary, too large, extension not allowed).
+"""
+import os
+import json
+import time
+import hashlib
+
+
+def snapshot_file_for(data_dir, root):
+    """Where the GUI keeps the snapshot of the last output generated for root"""
+    name = hashlib.blake2b(os.path.abspath(root).encode("utf-8", "surrogatepass"), digest_size=8).hexdigest()
+    return os.path.join(data_dir, "snapshots", f"{name}.json")
+
+
+class Snapshot:
+    def __init__(self, root, files=None, created=None):
+        self.root = root
+        self.files = files if files is not None else {}  # rel path -> [size, mtime_ns, digest hex or None]
+        self.created = created
+
+    @staticmethod
+    def key(rel_path):
+        return rel_path.replace(os.sep, "/")
+
+    def add(self, rel_path, st, digest):
+        self.files[self.key(rel_path)] = [st.st_size, st.st_mtime_ns, digest.hex() if digest is not None else None]
+
+    def get(self, rel_path):
+        return self.files.get(self.key(rel_path))
+
+    def save(self, file_path):
+        """Writes the manifest, replacing the previous one only once it is complete"""
+        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+        temp_path = file_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({'version': 1, 'root': self.root, 'created': time.time(), 'files': self.files}, f)
+        os.replace(temp_path, file_path)
+
+    @classmethod
+    def load(cls, file_path):
+        """Reads a manifest, None if there is none; raises ValueError for a file that isn't one"""
+        try:
+            with open(file_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        if not isinstance(data, dict) or data.get('version') != 1:
+            raise ValueError(f"{file_path} is not a snapshot manifest")
+        return cls(data['root'], data['files'], data.get('created'))
@@ -0,0 +1,84 @@
+import time
+import sqlite3
+
+# Files and folders modified this recently may change again within the same mtime tick
+RACY_WINDOW_NS = 2 * 10**9
+
+
+class SQLiteStore:
+    """A SQLite database written by several threads and processes, for the scan index and the content cache.
+
+    The database is in WAL mode, so reads don't block the writer, and writes are committed
+    after COMMIT_EVERY statements or COMMIT_SECONDS, so no transaction holds the write lock
+    for long. A writer waits up to BUSY_TIMEOUT seconds for another one; if the database
+    still can't be used, the store closes itself and its owner carries on without it.
+    Callers serialize their calls with their own lock.
+    """
+    COMMIT_EVERY = 200
+    COMMIT_SECONDS = 0.25
+    BUSY_TIMEOUT = 10
+
+    def __init__(self, file_path, schema=()):
+        """Opens the database and runs the schema statements; raises sqlite3.DatabaseError if it can't be used"""
+        self.conn = sqlite3.connect(file_path, timeout=self.BUSY_TIMEOUT, check_same_thread=False)
+        try:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            for statement in schema:
+                self.conn.execute(statement)
+            self.conn.commit()
+        except sqlite3.DatabaseError:
+            self.conn.close()
+            raise
+        self.pending_writes = 0
+        self.last_commit = time.perf_counter()
+
+    @property
+    def closed(self):
+        return self.conn is None
+
+    def query(self, sql, parameters=()):
+        """Returns the rows of a read, [] once the store is closed"""
+        if self.conn is None:
+            return []
+        try:
+            return self.conn.execute(sql, parameters).fetchall()
+        except sqlite3.OperationalError:
+            self.close(commit=False)
+            return []
+
+    def write(self, sql, parameters=()):
+        """Runs a write, committing if the transaction is due; returns False once the store is closed"""
+        if self.conn is None:
+            return False
+        try:
+            self.conn.execute(sql, parameters)
+            self.pending_writes += 1
+            if self.pending_writes >= self.COMMIT_EVERY or time.perf_counter() - self.last_commit >= self.COMMIT_SECONDS:
+                self.conn.commit()
+                self.pending_writes = 0
+                self.last_commit = time.perf_counter()
+        except sqlite3.OperationalError:
+            self.close(commit=False)
+            return False
+        return True
+
+    def commit(self):
+        if self.conn is None:
+            return
+        try:
+            self.conn.commit()
+            self.pending_writes = 0
+            self.last_commit = time.perf_counter()
+        except sqlite3.OperationalError:
+            self.close(commit=False)
+
+    def close(self, commit=True):
+        if self.conn is None:
+            return
+        if commit:
+            try:
+                self.conn.commit()
+            except sqlite3.OperationalError:
+                pass  # Locked until the end, the writes are redone next time
+        self.conn.close()
+        self.conn = None
@@ -0,0 +1,262 @@
+import os
+import sys
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+
+from ignore_rules import IGNORE_FILES
+
+# inotify constants from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyBackend:
+    """Kernel change notifications for every watched folder (Linux only)"""
+    mode = "inotify"
+    MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_CLOSE_WRITE | IN_ONLYDIR
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.paths = {}  # watch descriptor -> folder path
+        self.descriptors = {}  # folder path -> watch descriptor
+
+    def start(self, paths):
+        try:
+            for path in paths:
+                self.watch(path)
+        except OSError:
+            # Usually ENOSPC: more folders than fs.inotify.max_user_watches allows
+            self.close()
+            raise
+
+    def watch(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        self.paths[wd] = path
+        self.descriptors[path] = wd
+
+    def watching(self, path):
+        return path in self.descriptors
+
+    def unwatch(self, path):
+        wd = self.descriptors.pop(path, None)
+        if wd is not None:
+            self.paths.pop(wd, None)
+            self.libc.inotify_rm_watch(self.fd, wd)  # Fails harmlessly if the folder is already gone
+
+    def wait(self, timeout):
+        """Returns (folders whose entries changed, files that were written), or None after an overflow"""
+        dirty, modified = set(), set()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return dirty, modified
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return dirty, modified
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0"))
+            offset += EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                return None
+            path = self.paths.get(wd)
+            if path is None:
+                continue
+            if mask & IN_IGNORED:
+                # The kernel dropped the watch, the folder was deleted. The parent is checked so
+                # a folder created again under the same name is watched again.
+                self.paths.pop(wd, None)
+                if self.descriptors.get(path) == wd:
+                    del self.descriptors[path]
+                dirty.add(os.path.dirname(path))
+            elif mask & IN_CLOSE_WRITE and not mask & IN_ISDIR:
+                modified.add(os.path.join(path, name))
+            else:
+                dirty.add(path)
+                if mask & IN_CREATE and mask & IN_ISDIR:
+                    dirty.add(os.path.join(path, name))
+        return dirty, modified
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingBackend:
+    """Compares folder mtimes every INTERVAL seconds; only entry changes are detected"""
+    mode = "polling"
+    INTERVAL = 2.0
+
+    def __init__(self):
+        self.mtimes = {}
+
+    def mtime(self, path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def start(self, paths):
+        for path in paths:
+            self.watch(path)
+
+    def watch(self, path):
+        self.mtimes[path] = self.mtime(path)
+
+    def watching(self, path):
+        return path in self.mtimes
+
+    def unwatch(self, path):
+        self.mtimes.pop(path, None)
+
+    def wait(self, timeout):
+        time.sleep(self.INTERVAL)
+        dirty = set()
+        for path, mtime in list(self.mtimes.items()):
+            current = self.mtime(path)
+            if current != mtime:
+                self.mtimes[path] = current
+                dirty.add(path)
+        return dirty, set()
+
+    def close(self):
+        pass
+
+
+class Watcher(threading.Thread):
+    """Keeps watching the folders of a scanned tree and reports debounced batches of changes.
+
+    on_changes(listings, removed, modified) is called from the watcher thread with the new
+    (path, dirs, files) of every folder whose entries changed, new subfolders included and
+    parents first, the folders that disappeared, and the files whose contents were written.
+    """
+    # A batch is sent once no event arrived for DEBOUNCE seconds, or MAX_DELAY after its first event
+    DEBOUNCE = 0.3
+    MAX_DELAY = 2.0
+
+    def __init__(self, engine, root, listings, on_changes):
+        super().__init__(daemon=True)
+        self.engine = engine
+        self.root = root
+        # path -> (dirs, files) as last reported, owned by the watcher thread
+        self.listings = listings
+        self.on_changes = on_changes
+        self.stop_event = threading.Event()
+        self.backend = None
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        try:
+            self.backend = InotifyBackend()
+            self.backend.start(list(self.listings))
+        except OSError:
+            self.backend = PollingBackend()
+            self.backend.start(list(self.listings))
+
+        dirty, modified = set(), set()
+        first_event = last_event = 0
+        try:
+            while not self.stop_event.is_set():
+                events = self.backend.wait(self.DEBOUNCE if dirty or modified else 1.0)
+                now = time.monotonic()
+                if events is None:
+                    # Too many events were dropped, check every folder again
+                    events = set(self.listings), set()
+                if events[0] or events[1]:
+                    if not dirty and not modified:
+                        first_event = now
+                    last_event = now
+                    dirty |= events[0]
+                    modified |= events[1]
+                if (dirty or modified) and (now - last_event >= self.DEBOUNCE or now - first_event >= self.MAX_DELAY):
+                    self.flush(dirty, modified)
+                    dirty, modified = set(), set()
+        finally:
+            self.backend.close()
+
+    def flush(self, dirty, modified):
+        listings, removed = [], []
+        # An edited ignore file changes which entries of its folder are kept
+        dirty |= {os.path.dirname(path) for path in modified if os.path.basename(path) in IGNORE_FILES}
+        # Sorted so parents are handled before their subfolders
+        for path in sorted(dirty):
+            if path in self.listings:
+                self.refresh(path, listings, removed)
+        if not self.stop_event.is_set() and (listings or removed or modified):
+            self.on_changes(listings, removed, sorted(modified))
+
+    def refresh(self, path, listings, removed):
+        old_dirs, old_files = self.listings[path]
+        listing = self.engine.list_directory(path)
+        if listing is None:
+            return  # Deleted, reported through its parent folder
+        rules, dirs, files = self.engine.apply_rules(self.engine.ignore_rules_for(self.root, path), path, *listing)
+        # Deleted and created again under the same name (rm -rf build && mkdir build), which
+        # leaves the entries of path as they were but dropped the folder's watch
+        recreated = {name for name in dirs if name in old_dirs and not self.backend.watching(os.path.join(path, name))}
+        if dirs == old_dirs and files == old_files and not recreated:
+            return
+
+        if dirs != old_dirs or files != old_files:
+            self.listings[path] = (dirs, files)
+            listings.append((path, dirs, files))
+        for name in set(old_dirs) - set(dirs):
+            self.forget(os.path.join(path, name))
+            removed.append(os.path.join(path, name))
+        for name in dirs:
+            if name not in old_dirs or name in recreated:
+                # A new folder arrives with its whole subtree already in it (git checkout, unzip)
+                gone = set(self.forget(os.path.join(path, name))) if name in recreated else set()
+                for sub_path, sub_dirs, sub_files in self.engine.walk_directory(os.path.join(path, name), None, rules.enter(name)):
+                    self.listings[sub_path] = (sub_dirs, sub_files)
+                    self.watch(sub_path)
+                    listings.append((sub_path, sub_dirs, sub_files))
+                    gone.discard(sub_path)
+                # Subfolders of the old folder that the new one doesn't have
+                removed.extend(sorted(sub_path for sub_path in gone if os.path.dirname(sub_path) not in gone))
+
+    def watch(self, path):
+        try:
+            self.backend.watch(path)
+        except OSError:
+            pass  # Out of watches, the folder is still listed but won't be watched
+
+    def forget(self, path):
+        """Stops watching a folder and its subfolders; returns the paths of those that were listed"""
+        forgotten = []
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            if current in self.listings:
+                forgotten.append(current)
+            dirs, _ = self.listings.pop(current, ((), ()))
+            self.backend.unwatch(current)
+            stack.extend(os.path.join(current, name) for name in dirs)
+        return forgotten